@@ -0,0 +1,41 @@
+"""add firm scoped indexes
+
+Revision ID: b7d2e4f1a9c3
+Revises: ec14e30dc73d
+Create Date: 2024-02-06 16:40:12.881406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4f1a9c3'
+down_revision: Union[str, None] = 'ec14e30dc73d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FIRM_INDEXES = {
+    'ix_applications_firm_stage': ['firm', 'stage'],
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction, and avoids locking writes on a live table.
+    with op.get_context().autocommit_block():
+        for name, columns in FIRM_INDEXES.items():
+            op.create_index(name, 'applications', columns, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(
+            'ix_applications_user_last_updated', 'applications', ['user_id', sa.text('last_updated DESC')],
+            postgresql_where=sa.text('firm IS NOT NULL'), postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_applications_user_last_updated', table_name='applications', postgresql_concurrently=True, if_exists=True)
+        for name in reversed(list(FIRM_INDEXES)):
+            op.drop_index(name, table_name='applications', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,68 @@
+"""allocate application ids in database
+
+Revision ID: c3f8a2d5e6b1
+Revises: b7d2e4f1a9c3
+Create Date: 2024-02-08 11:02:37.514290
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a2d5e6b1'
+down_revision: Union[str, None] = 'b7d2e4f1a9c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS application_id_seq AS bigint MAXVALUE 1073741823")
+    op.execute("""
+    CREATE OR REPLACE FUNCTION permute_application_id(value bigint) RETURNS integer AS $$
+    DECLARE
+        l1 integer := (value >> 15) & 32767;
+        r1 integer := value & 32767;
+        l2 integer;
+        r2 integer;
+    BEGIN
+        -- Three-round Feistel network over 30 bits; a bijection, so distinct inputs give distinct IDs
+        FOR i IN 1..3 LOOP
+            l2 := r1;
+            r2 := l1 # ((((1366 * r1 + 150889) % 714025) / 714025.0) * 32767)::integer;
+            l1 := l2;
+            r1 := r2;
+        END LOOP;
+        RETURN (r1 << 15) + l1;
+    END;
+    $$ LANGUAGE plpgsql IMMUTABLE STRICT
+    """)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION next_application_id() RETURNS integer AS $$
+    DECLARE
+        candidate integer;
+    BEGIN
+        LOOP
+            candidate := 100000000 + permute_application_id(nextval('application_id_seq'));
+            -- Rows from the old random allocator share this range; skip any ID they already hold
+            EXIT WHEN NOT EXISTS (SELECT 1 FROM applications WHERE application_id = candidate);
+        END LOOP;
+        RETURN candidate;
+    END;
+    $$ LANGUAGE plpgsql VOLATILE
+    """)
+
+    # Replace the unused serial default; the app always picked IDs itself until now
+    op.alter_column('applications', 'application_id', server_default=sa.text('next_application_id()'))
+    op.execute("DROP SEQUENCE IF EXISTS applications_application_id_seq")
+
+
+def downgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS applications_application_id_seq OWNED BY applications.application_id")
+    op.execute("SELECT setval('applications_application_id_seq', COALESCE((SELECT max(application_id) FROM applications), 0) + 1, false)")
+    op.alter_column('applications', 'application_id', server_default=sa.text("nextval('applications_application_id_seq')"))
+    op.execute("DROP FUNCTION IF EXISTS next_application_id()")
+    op.execute("DROP FUNCTION IF EXISTS permute_application_id(bigint)")
+    op.execute("DROP SEQUENCE IF EXISTS application_id_seq")
@@ -0,0 +1,32 @@
+"""add blank applications index
+
+Revision ID: d1e7b3c9f2a4
+Revises: c3f8a2d5e6b1
+Create Date: 2024-02-09 09:15:44.203118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1e7b3c9f2a4'
+down_revision: Union[str, None] = 'c3f8a2d5e6b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Lets the janitor find old blank rows without scanning the whole table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_applications_blank_last_updated', 'applications', ['last_updated'],
+            postgresql_where=sa.text('firm IS NULL AND city IS NULL'), postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_applications_blank_last_updated', table_name='applications', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,38 @@
+"""create app counters table
+
+Revision ID: e5c2a8d4b7f1
+Revises: d1e7b3c9f2a4
+Create Date: 2024-02-10 14:27:05.611942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c2a8d4b7f1'
+down_revision: Union[str, None] = 'd1e7b3c9f2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'app_counters',
+        sa.Column('name', sa.String, primary_key=True),
+        sa.Column('value', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime, nullable=False, server_default=sa.text("timezone('UTC', now())")),
+    )
+    # Seed from the current data; the app keeps them in step from here on
+    op.execute("""
+        INSERT INTO app_counters (name, value)
+        SELECT 'total_applications', count(*) FROM applications WHERE firm IS NOT NULL
+        UNION ALL
+        SELECT 'total_users', count(*) FROM users
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('app_counters')
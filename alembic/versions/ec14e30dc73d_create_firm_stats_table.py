@@ -0,0 +1,46 @@
+"""create firm_stats table
+
+Revision ID: ec14e30dc73d
+Revises: 42feb9574f23
+Create Date: 2024-02-05 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ec14e30dc73d'
+down_revision: Union[str, None] = '42feb9574f23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Populate afterwards with `python -m app.stats rebuild`; until then reads fall back to live aggregates.
+    op.create_table(
+        'firm_stats',
+        sa.Column('firm', sa.String, primary_key=True),
+        sa.Column('total_users_for_firm', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('total_applications', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('successful_applications', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('applications_with_screener', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('applications_with_callback', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('rejections', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('median_applied_success', sa.Float, nullable=True),
+        sa.Column('median_applied_not_success', sa.Float, nullable=True),
+        sa.Column('median_screener_success', sa.Float, nullable=True),
+        sa.Column('median_screener_not_success', sa.Float, nullable=True),
+        sa.Column('median_callback_success', sa.Float, nullable=True),
+        sa.Column('median_callback_not_success', sa.Float, nullable=True),
+        sa.Column('screener_start', sa.Date, nullable=True),
+        sa.Column('callback_start', sa.Date, nullable=True),
+        sa.Column('offer_start', sa.Date, nullable=True),
+        sa.Column('refreshed_at', sa.DateTime, nullable=False, server_default=sa.text("(timezone('utc', CURRENT_TIMESTAMP))")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('firm_stats')
@@ -0,0 +1,38 @@
+"""drop firm response date indexes
+
+Revision ID: f3a9c1e6d2b8
+Revises: e5c2a8d4b7f1
+Create Date: 2024-02-12 10:05:31.480266
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c1e6d2b8'
+down_revision: Union[str, None] = 'e5c2a8d4b7f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Earlier versions of b7d2e4f1a9c3 created these; the single-pass stats aggregate filters on firm alone
+UNUSED_INDEXES = {
+    'ix_applications_firm_applied_response_date': ['firm', 'applied_response_date'],
+    'ix_applications_firm_screener_response_date': ['firm', 'screener_response_date'],
+    'ix_applications_firm_callback_response_date': ['firm', 'callback_response_date'],
+}
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in UNUSED_INDEXES:
+            op.drop_index(name, table_name='applications', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in UNUSED_INDEXES.items():
+            op.create_index(name, 'applications', columns, postgresql_concurrently=True, if_not_exists=True)
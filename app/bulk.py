@@ -0,0 +1,130 @@
+"""CSV and NDJSON reading and writing for application import/export.
+
+Readers consume the request body chunk by chunk and yield one
+`(row_number, fields)` pair per record, or `(row_number, error)` when a
+record cannot be parsed, so nothing holds the whole upload in memory.
+Writers turn batches of application rows into text chunks for a StreamingResponse.
+"""
+import codecs
+import csv
+from datetime import date, datetime
+import io
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, Tuple, Union
+
+# Columns written on export; import accepts the same header (application_id is ignored)
+EXPORT_FIELDS = [
+    'application_id', 'firm', 'city', 'networked', 'stage',
+    'applied_date', 'applied_response_date', 'applied_to_response',
+    'screener_date', 'screener_response_date', 'screener_to_response',
+    'callback_date', 'callback_response_date', 'callback_to_response',
+    'last_updated',
+]
+LIST_SEPARATOR = ';'
+
+ParsedRow = Tuple[int, Union[Dict[str, Any], str]]
+
+
+async def _records(chunks: AsyncIterator[bytes], quoted: bool) -> AsyncIterator[str]:
+    """Split a byte stream into records on newlines, ignoring newlines inside CSV quotes when `quoted`."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer, scanned, quotes = '', 0, 0
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        start = 0
+        while True:
+            newline = buffer.find('\n', scanned)
+            if newline == -1:
+                break
+            if quoted:
+                # An escaped quote ("") adds two, so an odd count means the newline is inside a field
+                quotes += buffer.count('"', scanned, newline)
+            scanned = newline + 1
+            if quotes % 2 == 0:
+                yield buffer[start:newline].rstrip('\r')
+                start, quotes = newline + 1, 0
+        buffer, scanned = buffer[start:], scanned - start
+
+    buffer += decoder.decode(b'', final=True)
+    if buffer.strip():
+        yield buffer.rstrip('\r\n')
+
+
+def _blank_to_none(value):
+    return value if value not in ('', None) else None
+
+
+async def read_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    header = None
+    row_number = 0
+    async for record in _records(chunks, quoted=True):
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            row_number += 1
+            yield row_number, f"Malformed CSV: {e}"
+            continue
+
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, f"Expected {len(header)} columns, found {len(values)}"
+            continue
+
+        fields = {name: _blank_to_none(value) for name, value in zip(header, values)}
+        if fields.get('networked'):
+            fields['networked'] = [item.strip() for item in fields['networked'].split(LIST_SEPARATOR) if item.strip()]
+        yield row_number, fields
+
+
+async def read_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    row_number = 0
+    async for record in _records(chunks, quoted=False):
+        if not record.strip():
+            continue
+        row_number += 1
+        try:
+            fields = json.loads(record)
+        except ValueError as e:
+            yield row_number, f"Malformed JSON: {e}"
+            continue
+        if not isinstance(fields, dict):
+            yield row_number, "Each line must be a JSON object"
+            continue
+        yield row_number, fields
+
+
+def _export_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _row_dict(application) -> Dict[str, Any]:
+    return {field: _export_value(getattr(application, field)) for field in EXPORT_FIELDS}
+
+
+def csv_header() -> str:
+    output = io.StringIO()
+    csv.writer(output).writerow(EXPORT_FIELDS)
+    return output.getvalue()
+
+
+def csv_lines(applications: Iterable) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    for application in applications:
+        row = _row_dict(application)
+        if row['networked']:
+            row['networked'] = LIST_SEPARATOR.join(row['networked'])
+        writer.writerow(['' if row[field] is None else row[field] for field in EXPORT_FIELDS])
+    return output.getvalue()
+
+
+def ndjson_lines(applications: Iterable) -> str:
+    return ''.join(json.dumps(_row_dict(application)) + '\n' for application in applications)
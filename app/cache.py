@@ -0,0 +1,154 @@
+from collections import OrderedDict
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+
+class LRUCache:
+    """Bounded in-process cache with a per-entry TTL and least-recently-used eviction.
+
+    Its methods are coroutines only to share RedisCache's interface; none of them wait.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self.clock():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            return self._get(key)
+
+    async def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """The cached values among `keys`; keys that missed are left out."""
+        with self._lock:
+            values = {key: self._get(key) for key in keys}
+        return {key: value for key, value in values.items() if value is not None}
+
+    async def set(self, key: Hashable, value: Any):
+        await self.set_many({key: value})
+
+    async def set_many(self, items: Dict[Hashable, Any]):
+        with self._lock:
+            expires = self.clock() + self.ttl
+            for key, value in items.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def delete(self, key: Hashable):
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: Iterable[Hashable]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"backend": "local", "size": len(self), "maxsize": self.maxsize, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class RedisCache:
+    """Cache shared between workers through an asyncio Redis client.
+
+    The client needs `mget`, `delete(*keys)`, `scan_iter(match=...)` and a
+    `pipeline()` that queues `set(key, value, ex=...)`, as `redis.asyncio.Redis`
+    has, so a dict-backed fake works in its place. Many-key calls take one
+    round trip. Size is bounded by the server's own eviction policy rather than
+    by this class, so unlike LRUCache it reports no evictions.
+    """
+
+    def __init__(self, client, ttl: float = 60, prefix: str = "cache:",
+                 dumps: Callable[[Any], str] = json.dumps, loads: Callable[[str], Any] = json.loads):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.dumps = dumps
+        self.loads = loads
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.prefix}{key}"
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """The cached values among `keys`; keys that missed are left out."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = {}
+        for key, raw in zip(keys, await self.client.mget([self._key(key) for key in keys])):
+            if raw is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                values[key] = self.loads(raw)
+        return values
+
+    async def set(self, key: Hashable, value: Any):
+        await self.set_many({key: value})
+
+    async def set_many(self, items: Dict[Hashable, Any]):
+        if not items:
+            return
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(self._key(key), self.dumps(value), ex=max(1, int(self.ttl)))
+        await pipeline.execute()
+
+    async def delete(self, key: Hashable):
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: Iterable[Hashable]):
+        keys = [self._key(key) for key in keys]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+def create_cache(maxsize: int, ttl: float, redis_url: Optional[str] = None, prefix: str = "cache:", **serializers):
+    """Return a RedisCache when `redis_url` is set, otherwise an in-process LRUCache."""
+    if not redis_url:
+        return LRUCache(maxsize=maxsize, ttl=ttl)
+    try:
+        from redis import asyncio as redis
+    except ImportError as e:
+        raise RuntimeError("redis_url is set but the 'redis' package is not installed") from e
+    return RedisCache(redis.Redis.from_url(redis_url), ttl=ttl, prefix=prefix, **serializers)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import validator
+from typing import Optional
 
 class Settings(BaseSettings):
     database_host: str
@@ -15,6 +16,45 @@ class Settings(BaseSettings):
     google_client_secret: str
     url: str
     google_password: str
+    stats_cache_size: int = 1024
+    stats_cache_ttl: int = 60
+    redis_url: Optional[str] = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 1800
+    db_pool_timeout: int = 30
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30
+    http_timeout: float = 10
+    http_connect_timeout: float = 5
+    http_retries: int = 2
+    http_backoff: float = 0.2
+    http2: bool = False
+    grid_write_delay: float = 0.5
+    grid_write_max_delay: float = 2.0
+    grid_write_retries: int = 3
+    typeahead_limit: int = 20
+    user_cache_size: int = 4096
+    user_cache_ttl: int = 30
+    bcrypt_rounds: int = 12
+    bcrypt_workers: int = 2
+    idempotency_cache_size: int = 4096
+    idempotency_ttl: int = 3600
+    import_batch_size: int = 500
+    export_batch_size: int = 500
+    applications_page_size: int = 100
+    janitor_enabled: bool = True
+    janitor_interval: int = 3600
+    janitor_min_age: int = 86400
+    janitor_batch_size: int = 1000
+    query_repeat_warning: int = 10
+    validate_responses: bool = False
+    profiler_dir: str = 'profiles'
+    profiler_keep: int = 50
+    profiler_interval_ms: float = 5
+    profiler_slow_ms: Optional[float] = None
+    profiler_token_ttl: int = 3600
 
     class Config:
         env_file = '.env'
@@ -0,0 +1,81 @@
+"""Global totals kept in the `app_counters` table.
+
+Every write that changes a total adjusts its counter in the same transaction
+(`adjust`), so `read` is a primary-key lookup no matter how large the tables
+grow. `reconcile` recomputes the totals from scratch and corrects any drift;
+the janitor runs it periodically.
+
+    python -m app.counters reconcile
+"""
+import argparse
+import asyncio
+from typing import Dict
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+C = models.AppCounter
+
+TOTAL_APPLICATIONS = "total_applications"  # applications with a firm
+TOTAL_USERS = "total_users"
+COUNTERS = (TOTAL_APPLICATIONS, TOTAL_USERS)
+
+
+def _actual_counts():
+    return {
+        TOTAL_APPLICATIONS: select(func.count()).select_from(models.Application).where(models.Application.firm.isnot(None)).scalar_subquery(),
+        TOTAL_USERS: select(func.count()).select_from(models.User).scalar_subquery(),
+    }
+
+
+async def adjust(db: AsyncSession, **deltas: int):
+    """Add `deltas` to the named counters inside the caller's transaction."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    statement = pg_insert(C).values([{"name": name, "value": delta} for name, delta in deltas.items()])
+    await db.execute(statement.on_conflict_do_update(index_elements=[C.name], set_={"value": C.value + statement.excluded.value}))
+
+
+async def read(db: AsyncSession) -> Dict[str, int]:
+    """Return every counter, reconciling first if any is missing (e.g. a database built with create_all)."""
+    values = dict((await db.execute(select(C.name, C.value).where(C.name.in_(COUNTERS)))).all())
+    if len(values) < len(COUNTERS):
+        await reconcile(db)
+        values = dict((await db.execute(select(C.name, C.value).where(C.name.in_(COUNTERS)))).all())
+    return values
+
+
+async def reconcile(db: AsyncSession) -> Dict[str, int]:
+    """Reset every counter to its true value and commit. Returns the drift that was corrected, per counter."""
+    await db.execute(pg_insert(C).values([{"name": name, "value": 0} for name in COUNTERS]).on_conflict_do_nothing())
+
+    # Lock the counters before counting: a writer that has already inserted a row but not yet
+    # bumped its counter then waits for us, and its increment lands on the corrected value
+    stored = dict((await db.execute(select(C.name, C.value).where(C.name.in_(COUNTERS)).with_for_update())).all())
+    actual = dict((await db.execute(select(*[count.label(name) for name, count in _actual_counts().items()]))).mappings().one())
+
+    for name in COUNTERS:
+        await db.execute(C.__table__.update().where(C.name == name).values(value=actual[name], updated_at=func.now()))
+    await db.commit()
+    return {name: actual[name] - stored[name] for name in COUNTERS}
+
+
+async def _main(command):
+    from .database import SessionLocal
+
+    async with SessionLocal() as db:
+        drift = await reconcile(db)
+    for name, delta in drift.items():
+        print(f"{name}: corrected by {delta:+d}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintain the app_counters table.")
+    parser.add_argument("command", choices=["reconcile"])
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args.command)))
@@ -1,27 +1,47 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 
 from .config import settings
+from .metrics import pool_checkout_duration
 
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-DATABASE_URL = f"postgresql://{settings.database_username}:{settings.database_password}@{settings.database_host}/{settings.database_name}"
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Records how long each checkout waits for a free connection (db_pool_checkout_seconds)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_duration.observe(time.perf_counter() - start)
+
 
-# To create the table (if it doesn't exist)
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+DATABASE_URL = f"postgresql+psycopg://{settings.database_username}:{settings.database_password}@{settings.database_host}/{settings.database_name}"
 
-# To create the table (if it doesn't exist)
-Base.metadata.create_all(engine)
+engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=TimedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=True,
+)
+# expire_on_commit=False keeps loaded attributes usable after commit without an implicit (blocking) refresh
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 
+async def create_tables():
+    # To create the tables (if they don't exist)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
@@ -1,13 +1,46 @@
-import asyncio
 from datetime import datetime
-import httpx
 from nicegui import app, ui
 import pandas as pd
 import plotly.graph_objects as go
-from typing import Dict, Any, AnyStr
+from pydantic import ValidationError
+from typing import Dict, Any, AnyStr, Optional
 
+from . import loader, oauth2, schemas, services
 from .config import settings
-from .loader import load_cities, load_law_firms
+from .database import SessionLocal
+from .writebehind import WriteBehindBuffer
+
+
+class SearchSelect(ui.select, component='search_select.js'):
+    """A ui.select that shows the options it is sent, without filtering them again in the browser."""
+
+
+def search_select(kind, value=None, on_change=None, label='', limit=None):
+    """A select whose options come from the reference typeahead index as the user types.
+
+    Only the current value and the top matches are sent to the browser, rather
+    than the whole firm/city/school list for every row. The matches are fuzzy,
+    so the browser must not narrow them down to those containing the typed text.
+    """
+    limit = limit or settings.typeahead_limit
+
+    def options_for(query):
+        options = [match.value for match in loader.search(kind, query or '', limit)]
+        if select.value and select.value not in options:
+            options.insert(0, select.value)
+        return options
+
+    select = SearchSelect(label=label, options=[value] if value else [], value=value or None, with_input=True,
+                          on_change=on_change)
+    select.options = options_for('')
+    select.update()
+
+    def on_input(event):
+        select.options = options_for(event.args)
+        select.update()
+
+    select.on('input-value', on_input, throttle=0.2)
+    return select
 
 
 class CalendarPicker():
@@ -39,10 +72,10 @@ class CalendarPicker():
 class DataGrid:
     def __init__(self, existing_application=None, summary_stats=None):
         self.network_options = ["Junior", "Senior", "Reception"]
-        self.firms = load_law_firms()
-        self.cities = load_cities()
         self.summary_stats = summary_stats or {}
         self.application_id = existing_application.get('application_id') if existing_application else None
+        # Read once while the page request is current; the disconnect handler has no request to read storage from
+        self.user_id = oauth2.get_user_id_from_token(app.storage.user.get("token"))
         self.df = pd.DataFrame([{
             key: existing_application.get(key, None) for key in ['firm', 'city', 'networked', 'applied_to_response', 'screener_to_response', 'callback_to_response', 'stage']
         }])
@@ -110,29 +143,59 @@ class DataGrid:
             'Applied': 'applied_to_response'
         }
 
-    async def make_api_call(self, url, method="post", data=None):
-        headers = {'Authorization': f'Bearer {app.storage.user.get("token")}'}
-        async with httpx.AsyncClient() as client:
-            if method == "post":
-                response = await client.post(url, json=data, headers=headers)
-            elif method == "put":
-                response = await client.put(url, json=data, headers=headers)
-            return response
+        # Cell and calendar edits are merged and written once the user pauses
+        self.writes = WriteBehindBuffer(self.write_pending_changes, self.apply_saved_application)
+
+    async def save_application(self, user_id, application_id, update_data) -> Optional[dict]:
+        """Write `update_data` through the service layer and return the application with stats as JSON."""
+        if user_id is None or application_id is None:
+            return None
+        application_data = schemas.ApplicationUpdate(**update_data)
+
+        async with SessionLocal() as db:
+            updated_application = await services.update_application(db, user_id, int(application_id), application_data)
+        return services.as_json(schemas.ApplicationResponseWithStats, updated_application) if updated_application else None
+
+    async def write_pending_changes(self, update_data) -> Optional[dict]:
+        return await self.save_application(self.user_id, self.application_id, update_data)
+
+    def queue_write(self, fields: Dict[str, Any]):
+        """Validate each field on its own and queue the valid ones, so one bad value can't sink a coalesced write."""
+        valid = {}
+        for name, value in fields.items():
+            try:
+                schemas.ApplicationUpdate(**{name: value})
+            except ValidationError as e:
+                print(f"Failed to update application field {name}: {e}")
+                continue
+            valid[name] = value
+        if valid:
+            self.writes.submit(valid)
+
+    async def apply_saved_application(self, updated_application):
+        """Refresh storage and the stats widgets from the write that carried the newest edit."""
+        self.update_app_storage_with_prefix(updated_application)
+        self.summary_stats = updated_application['summary_stats']
+        self.update_ui_summary_stats()
+
+    async def flush_on_disconnect(self):
+        # The page is gone, so save what is pending without touching its widgets
+        self.writes.on_settled = None
+        await self.writes.flush()
 
     async def create_application(self):
-        application_data = {
-        }
+        user_id = self.user_id
+        if user_id is None:
+            print("Failed to create application: not authenticated")
+            return
 
-        response = await self.make_api_call(f'http://127.0.0.1:{settings.port}/applications/', "post", application_data)
+        async with SessionLocal() as db:
+            new_application = await services.create_application(db, user_id, schemas.ApplicationCreate())
 
-        if response.status_code == httpx.codes.CREATED:
-            new_application = response.json()
-            self.application_id = new_application['application_id']
-            # Optionally update other properties based on the response
-            self.update_app_storage_with_prefix(new_application)
-        else:
-            # Handle the error appropriately
-            print(f"Failed to create application: {response.text}")
+        new_application = services.as_json(schemas.ApplicationResponse, new_application)
+        self.application_id = new_application['application_id']
+        # Optionally update other properties based on the response
+        self.update_app_storage_with_prefix(new_application)
 
     async def update_date_application(self, stage, date_range):
         """Handle the updating of date fields."""
@@ -151,7 +214,7 @@ class DataGrid:
             self.dates_info.update({f'{stage}_Start': date_obj, f'{stage}_End': date_obj})
             start = end = date_obj
             # Update the date in the application here
-            asyncio.create_task(self.update_date_ranges_api(stage, start, end, 1))
+            self.update_date_ranges_api(stage, start, end, 1)
             return '1 day'
 
         # Check if date_range is not a dictionary
@@ -166,24 +229,23 @@ class DataGrid:
 
         delta = (end - start).days
         delta += 1
-        asyncio.create_task(self.update_date_ranges_api(stage, start, end, delta))
+        self.update_date_ranges_api(stage, start, end, delta)
 
 
         return f'{delta} days'
 
-    async def update_date_ranges_api(self, stage, start, end, delta):
-        """Asynchronously update the date ranges in the API."""
+    def update_date_ranges_api(self, stage, start, end, delta):
+        """Queue the date range change for the next coalesced write."""
 
         field = self.stage_to_field_mapping.get(stage, None)
 
         # Prepare the data for the API
         update_data = {
-            "application_id": self.application_id,
             self.api_mapping[f'{stage}_Start']: start.isoformat(),
             self.api_mapping[f'{stage}_End']: end.isoformat(),
             field: delta
         }
-        await self.make_api_call(f'http://127.0.0.1:{settings.port}/applications/{self.application_id}', "put", update_data)
+        self.queue_write(update_data)
 
     def add(self):
         # Define the structure of the new row (without the loop)
@@ -202,6 +264,8 @@ class DataGrid:
         self.render_grid()
 
     def render(self):
+        ui.context.client.on_disconnect(self.flush_on_disconnect)
+
         with ui.grid(rows=len(self.df.index) + 1).classes('grid-flow-col'):
             self.render_grid()
 
@@ -221,8 +285,8 @@ class DataGrid:
                 ui.markdown()
 
 
-    async def update_application(self, r, c, value, key):
-        """Update DataFrame and store the value in app.storage.user, then send update to API."""
+    def update_application(self, r, c, value, key):
+        """Update DataFrame and queue the value for the next coalesced write."""
         self.df.iat[r, c] = value
         # app.storage.user[key] = value
 
@@ -232,23 +296,8 @@ class DataGrid:
         # Convert UI field name to API field name
         api_field_name = self.api_mapping[field_name]
 
-        # Prepare the data for the API
-        update_data = {api_field_name: value}
-
-        # Send update request to the API
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                f'http://127.0.0.1:{settings.port}/applications/{application_id}',  # Adjust URL as needed
-                json=update_data,
-                headers={'Authorization': f'Bearer {app.storage.user.get("token")}'}
-            )
-
-            if response.status_code == httpx.codes.OK:
-                updated_application = response.json()
-                self.update_app_storage_with_prefix(updated_application)
-                self.summary_stats = updated_application['summary_stats']
-
-                self.update_ui_summary_stats()
+        # Merge into the pending write; stats are refreshed once it settles
+        self.queue_write({api_field_name: value})
 
     def update_ui_summary_stats(self):
         # Assume self.summary_stats is already updated with the latest data.
@@ -298,11 +347,11 @@ class DataGrid:
                 current_value = app.storage.user.get(key, row)
 
                 if col == 'Firm':
-                    ui.select(label='Firm', options=self.firms, with_input=True, value=current_value,
-                              on_change=lambda event, r=r, c=c, key=key: self.update_application(r, c, event.value, key))
+                    search_select('firm', label='Firm', value=current_value,
+                                  on_change=lambda event, r=r, c=c, key=key: self.update_application(r, c, event.value, key))
                 elif col == 'City':
-                    ui.select(label='City', options=self.cities, with_input=True, value=current_value,
-                              on_change=lambda event, r=r, c=c, key=key: self.update_application(r, c, event.value, key))
+                    search_select('city', label='City', value=current_value,
+                                  on_change=lambda event, r=r, c=c, key=key: self.update_application(r, c, event.value, key))
 
                 elif col == "Networked":
                     ui.select(label='', options=self.network_options, multiple=True, value=current_value,
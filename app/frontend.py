@@ -1,22 +1,37 @@
 import asyncio
 from authlib.integrations.starlette_client import OAuth, OAuthError
 from fastapi import Request, Depends, FastAPI, HTTPException, status
-import httpx
 from requests import post
 from nicegui import Client, app, ui
+from pydantic import ValidationError
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.responses import RedirectResponse, JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from fastapi_sso.sso.google import GoogleSSO
 
-from .loader import load_cities, load_law_schools, load_law_firms
-from .datagrid import DataGrid
+from .loader import find_law_school
+from .datagrid import DataGrid, search_select
 from .config import settings
-from . import oauth2
-from .database import get_db
-from .models import User
+from . import http_client, oauth2, schemas, services
+from .database import SessionLocal, get_db
+from .utils import get_user_by_email
+
+
+class PooledGoogleSSO(GoogleSSO):
+    """GoogleSSO that fetches the discovery document once, over the shared HTTP client.
+
+    The base class re-downloads it for every endpoint lookup, twice per login.
+    """
+    _discovery_document = None
+
+    async def get_discovery_document(self):
+        if PooledGoogleSSO._discovery_document is None:
+            response = await http_client.request('GET', self.discovery_url)
+            response.raise_for_status()
+            PooledGoogleSSO._discovery_document = response.json()
+        return PooledGoogleSSO._discovery_document
 
 
 def init(fastapi_app: FastAPI) -> None:
@@ -57,14 +72,14 @@ def init(fastapi_app: FastAPI) -> None:
     )
 
     def get_google_sso() -> GoogleSSO:
-        return GoogleSSO(settings.google_client_id, settings.google_client_secret, redirect_uri=f"{settings.url}:{settings.port}/auth")
+        return PooledGoogleSSO(settings.google_client_id, settings.google_client_secret, redirect_uri=f"{settings.url}:{settings.port}/auth")
 
     @app.get('/login/google')
     async def google_login(google_sso: GoogleSSO = Depends(get_google_sso)):
         return await google_sso.get_login_redirect()
 
     @app.get('/auth')
-    async def google_callback(request: Request, google_sso: GoogleSSO = Depends(get_google_sso), db: Session = Depends(get_db)):
+    async def google_callback(request: Request, google_sso: GoogleSSO = Depends(get_google_sso), db: AsyncSession = Depends(get_db)):
         user = await google_sso.verify_and_process(request)
         print(user)
 
@@ -72,58 +87,27 @@ def init(fastapi_app: FastAPI) -> None:
             email = user.email
             first_name = user.first_name
             print(first_name)
-            user = db.query(User).filter(User.email == email).first()
-            if not user:
-                async with httpx.AsyncClient() as client:
-                    await client.post(
-                        f'{settings.url}:{settings.port}/users/create',  # Adjust URL to your FastAPI backend
-                        json={
-                            "email": email,
-                            "password": settings.google_password
-                        })
-
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f'{settings.url}:{settings.port}/login',  # Adjust the URL to your FastAPI backend
-                    data={
-                        'username': email,
-                        'password': settings.google_password
-                    }
-                )
-                if response.status_code == 200:
-                    token_data = response.json()
-                    app.storage.user.update({
-                        'authenticated': True,
-                        'token': token_data['access_token']
-                    })
-
-                    app.storage.user['email'] = email
-                    app.storage.user['first_name'] = first_name
-
-                    law_schools_df = load_law_schools()
-                    email_domain = email.split('@')[-1]
-                    domain_parts = email_domain.split('.')
-                    if 'edu' in domain_parts:
-                        domain_index = domain_parts.index('edu')
-                        matched_domain = '.'.join(domain_parts[domain_index - 1:])
-                    else:
-                        matched_domain = 'NOT FOUND'
-
-                    # Attempt to match the domain to a school
-                    matched_schools = law_schools_df.loc[
-                        law_schools_df['Domain'].str.contains(matched_domain, case=False, na=False), 'School'].values
-                    print(matched_schools)
-                    # Only set 'school' in app.storage.user if a default school is found
-                    if len(matched_schools) > 0:
-                        default_school = matched_schools[0]  # Only set if there's at least one match
-                        app.storage.user['school'] = default_school
-
-                        async with httpx.AsyncClient() as client:
-                            await client.put(
-                                f'{settings.url}:{settings.port}/profiles/me',  # Adjust URL to your FastAPI backend
-                                json={'school': default_school},
-                                headers={'Authorization': f'Bearer {app.storage.user.get("token")}'}
-                            )
+            if not await get_user_by_email(email, db):
+                await services.create_user(db, schemas.UserCreate(email=email, password=settings.google_password))
+
+            user = await services.authenticate_user(db, email, settings.google_password)
+            if user:
+                app.storage.user.update({
+                    'authenticated': True,
+                    'token': oauth2.create_access_token(data={"sub": str(user.user_id)})
+                })
+
+                app.storage.user['email'] = email
+                app.storage.user['first_name'] = first_name
+
+                # Attempt to match the email domain (or a parent domain) to a school
+                matched_school = find_law_school(email)
+                # Only set 'school' in app.storage.user if a default school is found
+                if matched_school:
+                    default_school = matched_school.name
+                    app.storage.user['school'] = default_school
+
+                    await services.update_profile(db, user.user_id, schemas.ProfileUpdate(school=default_school))
 
         return RedirectResponse('me')
 
@@ -173,14 +157,10 @@ def init(fastapi_app: FastAPI) -> None:
                         </style>
                     ''')
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f'{settings.url}:{settings.port}/applications/total')
-                if response.status_code == 200:
-                    data = response.json()
-                    app.storage.user['total_applications'] = data['total_applications']
-                    app.storage.user['total_users'] = data['total_users']
-                else:
-                    return "Error fetching applications"
+            async with SessionLocal() as db:
+                data = await services.get_totals(db)
+            app.storage.user['total_applications'] = data['total_applications']
+            app.storage.user['total_users'] = data['total_users']
 
             ui.markdown("###OCI Tracker###").classes('full-width')
             # Use the 'light-blue-text' class for numbers
@@ -189,18 +169,11 @@ def init(fastapi_app: FastAPI) -> None:
                 'full-width')
             ui.button('Enter with School Email', icon='email', on_click=try_google_login).classes('full-width')
 
-    async def create_new_application(client):
-        application_data = {}
-        response = await client.post(
-            f'{settings.url}:{settings.port}/applications/',
-            json=application_data,
-            headers={'Authorization': f'Bearer {app.storage.user.get("token")}'}
-        )
-        return response.json()
-
-
     @ui.page('/me')
-    async def show():
+    async def show(client: Client):
+        user_id = oauth2.get_user_id_from_token(app.storage.user.get('token'))
+        if user_id is None:
+            return RedirectResponse('/login')
 
         with ui.header().classes('items-center justify-between'):
             # OCI Tracker label with specified classes for styling
@@ -213,40 +186,24 @@ def init(fastapi_app: FastAPI) -> None:
 
 
 
-        law_schools = load_law_schools()
-        law_schools = law_schools['School'].tolist()
 
-        # Fetch default profile data
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f'{settings.url}:{settings.port}/profiles/me',  # Adjust URL to your FastAPI backend
-                headers={'Authorization': f'Bearer {app.storage.user.get("token")}'}
-            )
-            profile_data = response.json()
+        async with SessionLocal() as db:
+            # Fetch default profile data
+            profile = await services.get_profile(db, user_id)
+            profile_data = services.as_json(schemas.ProfileResponse, profile) if profile else {}
 
             app.storage.user['school'] = profile_data.get('school', '')
             app.storage.user['rank'] = profile_data.get('rank', 50)
             app.storage.user['circumstances'] = profile_data.get('circumstances', None)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f'{settings.url}:{settings.port}/applications/me',
-                headers={'Authorization': f'Bearer {app.storage.user.get("token")}'}
-            )
-            if response.status_code == 404 and response.json().get('detail') == 'No applications found':
-                applications = await create_new_application(client)
-                applications = [applications]
-            else:
-                applications = [application for application in response.json()]
-
         async def update_profile(event, field_name):
             new_value = event.value
-            async with httpx.AsyncClient() as client:
-                await client.put(
-                    f'{settings.url}:{settings.port}/profiles/me',  # Adjust URL to your FastAPI backend
-                    json={field_name: new_value},
-                    headers={'Authorization': f'Bearer {app.storage.user.get("token")}'}
-                )
+            try:
+                profile_update = schemas.ProfileUpdate(**{field_name: new_value})
+            except ValidationError:
+                return
+            async with SessionLocal() as db:
+                await services.update_profile(db, user_id, profile_update)
 
         circumstances_options = [
             "Disabled",
@@ -260,9 +217,8 @@ def init(fastapi_app: FastAPI) -> None:
         with ui.row():
             ui.markdown()
             ui.markdown("**About You**").classes('full-width')
-            school_input = ui.select(label='School', options=law_schools, with_input=True,
-                                     on_change=lambda e: update_profile(e, 'school'))
-            school_input.value = app.storage.user['school']
+            school_input = search_select('school', label='School', value=app.storage.user['school'],
+                                         on_change=lambda e: update_profile(e, 'school'))
             rank_input = ui.number(label='Class Rank', value=app.storage.user['rank'], min=0, max=100, step=5,
                                    on_change=lambda e: update_profile(e, 'rank')).style('min-width: 100px;')
             rank_input.value = app.storage.user['rank']
@@ -276,27 +232,22 @@ def init(fastapi_app: FastAPI) -> None:
 
         async def add_application(application=None):
             if not application:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f'{settings.url}:{settings.port}/applications/',
-                        json={},
-                        headers={'Authorization': f'Bearer {app.storage.user.get("token")}'}
-                    )
-
-                    if response.status_code == 201:
-                        # Ensure this matches the expected structure in DataGrid
-                        application_data = response.json()
-                        # If the API doesn't return summary_stats, initialize them here
-                        application_with_stats = {
-                            'application': application_data,  # Assuming application_data has the application details
-                            'summary_stats': {'total_users_for_firm': 0, 'success_rate': 0}  # Example default values
-                        }
-
-                        new_datagrid = DataGrid(application_with_stats['application'],
-                                                application_with_stats['summary_stats'])
-                        new_datagrid.render()
-
-                    ui.button(on_click=lambda e: on_button_click(e.sender), icon='add')
+                async with SessionLocal() as db:
+                    new_application = await services.create_application(db, user_id, schemas.ApplicationCreate())
+
+                # Ensure this matches the expected structure in DataGrid
+                application_data = services.as_json(schemas.ApplicationResponse, new_application)
+                # A new application has no firm yet, so initialize its summary_stats here
+                application_with_stats = {
+                    'application': application_data,
+                    'summary_stats': {'total_users_for_firm': 0, 'success_rate': 0}  # Example default values
+                }
+
+                new_datagrid = DataGrid(application_with_stats['application'],
+                                        application_with_stats['summary_stats'])
+                new_datagrid.render()
+
+                ui.button(on_click=lambda e: on_button_click(e.sender), icon='add')
             else:
                 # Ensure existing application data is passed correctly
                 new_datagrid = DataGrid(application.get('application', application), application.get('summary_stats', {}))
@@ -310,9 +261,22 @@ def init(fastapi_app: FastAPI) -> None:
         with main_container:
             ui.markdown()
 
-            for application in applications:
-                await add_application(application)
+        # Send the page now and add each application's grid over the websocket as its stats arrive
+        await client.connected()
+
+        rendered = 0
+        async with SessionLocal() as db:
+            async for application in services.iter_user_applications_with_stats(db, user_id):
+                with main_container:
+                    await add_application(services.as_json(schemas.ApplicationResponseWithStats, application))
+                rendered += 1
 
+            if not rendered:
+                new_application = await services.get_or_create_blank_application(db, user_id)
+                with main_container:
+                    await add_application(services.as_json(schemas.ApplicationResponse, new_application))
+
+        with main_container:
             ui.button(on_click=lambda e: on_button_click(e.sender), icon='add')
             ui.markdown()
             ui.markdown()
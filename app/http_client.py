@@ -0,0 +1,81 @@
+"""One pooled httpx.AsyncClient for every outbound HTTP call the app makes.
+
+The client is opened on startup and closed on shutdown (see main.py), so
+connections are reused with keep-alive instead of paying a new TCP/TLS
+handshake per call.
+"""
+import asyncio
+import random
+import httpx
+from typing import Optional
+
+from .config import settings
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+        http2=settings.http2,
+    )
+
+
+async def start():
+    global _client
+    if _client is None:
+        _client = create_client()
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use outside the app lifecycle (scripts, tests)."""
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
+
+
+def _should_retry(method: str, error: Optional[Exception], response: Optional[httpx.Response]) -> bool:
+    if error is not None:
+        # A failed connect never reached the server, so it is safe to resend any method.
+        return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)) or method in IDEMPOTENT_METHODS
+    return method in IDEMPOTENT_METHODS and response.status_code in RETRY_STATUS_CODES
+
+
+async def request(method: str, url: str, *, retries: Optional[int] = None, **kwargs) -> httpx.Response:
+    """Send a request on the shared client, retrying transient failures with exponential backoff and jitter."""
+    method = method.upper()
+    retries = settings.http_retries if retries is None else retries
+    client = get_client()
+
+    for attempt in range(retries + 1):
+        error, response = None, None
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            error = e
+
+        if attempt == retries or not _should_retry(method, error, response):
+            if error is not None:
+                raise error
+            return response
+
+        if response is not None:
+            await response.aclose()
+        delay = settings.http_backoff * (2 ** attempt)
+        await asyncio.sleep(delay + random.uniform(0, delay))
@@ -0,0 +1,118 @@
+"""Background janitor for blank applications.
+
+A blank application has neither a firm nor a city. They are created for every
+new user and by the /me page and DataGrid "add" button, and never shown once
+they are empty. Rather than deleting them on login, a background task removes
+the ones older than `janitor_min_age` seconds every `janitor_interval`
+seconds, `janitor_batch_size` rows per transaction. Concurrent janitors (one
+per worker) skip each other's locked rows, so they share the work.
+
+Each pass also reconciles the global counters (see app/counters.py), so any
+drift in /applications/total lasts at most one interval.
+
+    python -m app.janitor   # run one pass now
+"""
+import asyncio
+from datetime import datetime, timedelta
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import counters, models
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+A = models.Application
+
+janitor_stats = {"runs": 0, "reclaimed_total": 0, "last_reclaimed": 0, "last_counter_drift": {},
+                 "last_duration_ms": None, "last_run_at": None}
+
+_task: Optional[asyncio.Task] = None
+
+
+def stale_blank_applications(min_age: float, batch_size: int):
+    # NULL last_updated only occurs on rows written before create_application stopped sending it explicitly
+    # The cutoff uses the database clock, like the func.now() that writes last_updated
+    cutoff = func.now() - timedelta(seconds=min_age)
+    return (
+        select(A.application_id)
+        .where(A.firm.is_(None), A.city.is_(None), or_(A.last_updated.is_(None), A.last_updated < cutoff))
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+async def reclaim_blank_applications(db: AsyncSession, min_age: Optional[float] = None, batch_size: Optional[int] = None) -> int:
+    """Delete stale blank applications in batches, committing each batch. Returns the number of rows deleted."""
+    min_age = settings.janitor_min_age if min_age is None else min_age
+    batch_size = batch_size or settings.janitor_batch_size
+
+    reclaimed = 0
+    while True:
+        result = await db.execute(
+            delete(A)
+            .where(A.application_id.in_(stale_blank_applications(min_age, batch_size)))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        reclaimed += result.rowcount
+        if result.rowcount < batch_size:
+            return reclaimed
+
+
+async def run_once() -> int:
+    start = time.perf_counter()
+    async with SessionLocal() as db:
+        reclaimed = await reclaim_blank_applications(db)
+        drift = await counters.reconcile(db)
+    duration_ms = (time.perf_counter() - start) * 1000
+
+    janitor_stats.update(
+        runs=janitor_stats["runs"] + 1,
+        reclaimed_total=janitor_stats["reclaimed_total"] + reclaimed,
+        last_reclaimed=reclaimed,
+        last_counter_drift=drift,
+        last_duration_ms=round(duration_ms, 1),
+        last_run_at=datetime.utcnow().isoformat(),
+    )
+    logger.info("Janitor reclaimed %d blank applications in %.1f ms", reclaimed, duration_ms)
+    if any(drift.values()):
+        logger.warning("Janitor corrected counter drift: %s", drift)
+    return reclaimed
+
+
+async def _loop():
+    while True:
+        await asyncio.sleep(settings.janitor_interval)
+        try:
+            await run_once()
+        except Exception:
+            logger.exception("Janitor run failed")
+
+
+async def start():
+    """Startup handler: schedule the janitor if it is enabled."""
+    global _task
+    if settings.janitor_enabled and _task is None:
+        _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_once())
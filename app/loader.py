@@ -1,24 +1,150 @@
-import pandas as pd
-def load_cities(file_path='src/us_cities.csv'):
-    try:
-        cities_df = pd.read_csv(file_path)
-        return sorted(cities_df['city'].tolist())
-    except FileNotFoundError:
-        print(f"Error: File '{file_path}' not found.")
-        return []
-
-def load_law_schools(file_path='src/law_school_rank.csv'):
-    try:
-        law_school_df = pd.read_csv(file_path)
-        return law_school_df[['School', 'Domain']].sort_values(by='School').reset_index(drop=True)
-    except FileNotFoundError:
-        print(f"Error: File '{file_path}' not found.")
-        return pd.DataFrame(columns=['School', 'Domain'])
-
-def load_law_firms(file_path='src/firms.csv'):
-    try:
-        firms_df = pd.read_csv(file_path)
-        return sorted(firms_df['firm'].tolist())
-    except FileNotFoundError:
-        print(f"Error: File '{file_path}' not found.")
-        return []
\ No newline at end of file
+"""Reference data (cities, law firms, law schools) read from the CSVs in src/.
+
+Each file is parsed once with the csv module into immutable tuples and
+frozensets. It is parsed again only when its mtime changes, and the mtime is
+checked at most every `RELOAD_CHECK_INTERVAL` seconds, so lookups in the
+request path are plain attribute reads.
+"""
+import csv
+import os
+import time
+from types import MappingProxyType
+from typing import Callable, FrozenSet, Generic, List, Mapping, NamedTuple, Optional, Tuple, TypeVar
+
+from .search import Match, SearchIndex
+
+RELOAD_CHECK_INTERVAL = 1.0
+
+T = TypeVar('T')
+
+
+class Choices(NamedTuple):
+    options: Tuple[str, ...]   # sorted, for select widgets
+    members: FrozenSet[str]    # for validation
+    index: SearchIndex         # for typeahead
+
+
+class LawSchool(NamedTuple):
+    name: str
+    domain: str
+    rank: Optional[int]
+
+
+class LawSchools(NamedTuple):
+    schools: Tuple[LawSchool, ...]  # sorted by name
+    options: Tuple[str, ...]
+    members: FrozenSet[str]
+    index: SearchIndex
+    by_domain: Mapping[Tuple[str, ...], LawSchool]  # reversed domain labels -> school
+
+
+def domain_key(domain: str) -> Tuple[str, ...]:
+    """'law.Harvard.edu' -> ('edu', 'harvard', 'law')."""
+    return tuple(reversed(domain.strip().strip('.').lower().split('.')))
+
+
+def _read_rows(file_path):
+    with open(file_path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def _parse_choices(column):
+    def parse(file_path) -> Choices:
+        values = sorted(row[column] for row in _read_rows(file_path) if row.get(column))
+        return Choices(tuple(values), frozenset(values), SearchIndex(values))
+    return parse
+
+
+def _parse_law_schools(file_path) -> LawSchools:
+    schools = sorted(
+        (LawSchool(row['School'], row.get('Domain') or '', int(row['Rank']) if row.get('Rank', '').isdigit() else None)
+         for row in _read_rows(file_path) if row.get('School')),
+        key=lambda school: school.name
+    )
+    names = tuple(school.name for school in schools)
+
+    by_domain = {}
+    for school in schools:
+        if school.domain:
+            # Schools sharing a domain resolve to the first by name
+            by_domain.setdefault(domain_key(school.domain), school)
+    return LawSchools(tuple(schools), names, frozenset(names), SearchIndex(names), MappingProxyType(by_domain))
+
+
+class ReferenceTable(Generic[T]):
+    """One CSV file, parsed on first use and re-parsed when it changes on disk."""
+
+    def __init__(self, file_path: str, parse: Callable[[str], T], empty: T):
+        self.file_path = file_path
+        self.parse = parse
+        self.empty = empty
+        self._value: Optional[T] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = float('-inf')
+
+    def get(self) -> T:
+        now = time.monotonic()
+        if self._value is None or now - self._checked_at >= RELOAD_CHECK_INTERVAL:
+            self._checked_at = now
+            self._reload_if_changed()
+        return self._value
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.file_path).st_mtime
+        except FileNotFoundError:
+            if self._value is None:
+                print(f"Error: File '{self.file_path}' not found.")
+                self._value = self.empty
+            return
+
+        if mtime != self._mtime:
+            self._value = self.parse(self.file_path)
+            self._mtime = mtime
+
+
+cities = ReferenceTable('src/us_cities.csv', _parse_choices('city'), Choices((), frozenset(), SearchIndex(())))
+law_firms = ReferenceTable('src/firms.csv', _parse_choices('firm'), Choices((), frozenset(), SearchIndex(())))
+law_schools = ReferenceTable('src/law_school_rank.csv', _parse_law_schools,
+                             LawSchools((), (), frozenset(), SearchIndex(()), MappingProxyType({})))
+
+# Tables the typeahead can search, by the `kind` used in /reference/search
+SEARCHABLE = {'firm': law_firms, 'city': cities, 'school': law_schools}
+
+
+def preload():
+    """Parse every reference file up front (registered as a startup handler)."""
+    for table in (cities, law_firms, law_schools):
+        table.get()
+
+
+def load_cities() -> Tuple[str, ...]:
+    return cities.get().options
+
+
+def load_law_schools() -> Tuple[LawSchool, ...]:
+    return law_schools.get().schools
+
+
+def load_law_firms() -> Tuple[str, ...]:
+    return law_firms.get().options
+
+
+def search(kind: str, query: str, limit: int = 10) -> List[Match]:
+    return SEARCHABLE[kind].get().index.search(query, limit)
+
+
+def find_law_school(email_or_domain: str) -> Optional[LawSchool]:
+    """Return the school whose domain is the longest suffix of the email's domain, if any.
+
+    Subdomains and alumni addresses resolve to the parent school
+    ('jd@law.harvard.edu', 'x@alumni.stanford.edu'); unrelated domains that only
+    contain a school's domain as a substring ('notyale.edu') do not.
+    """
+    labels = domain_key(email_or_domain.rpartition('@')[2])
+    by_domain = law_schools.get().by_domain
+    for length in range(len(labels), 0, -1):
+        school = by_domain.get(labels[:length])
+        if school is not None:
+            return school
+    return None
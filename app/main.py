@@ -2,12 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
-from .database import  engine
-from . import frontend, models
-from .routers import user, auth, profile, application
-
-
-models.Base.metadata.create_all(bind=engine)
+from .database import create_tables
+from . import frontend, http_client, janitor, loader, metrics, models, profiler, querycount, serialization
+from .routers import user, auth, profile, application, reference
 
 # Set up CORS middleware options
 origins = [
@@ -15,7 +12,14 @@ origins = [
     "https://www.google.com/"
 ]
 
-app = FastAPI()
+app = FastAPI(default_response_class=serialization.ORJSONResponse)
+
+app.add_event_handler("startup", create_tables)
+app.add_event_handler("startup", loader.preload)
+app.add_event_handler("startup", http_client.start)
+app.add_event_handler("startup", janitor.start)
+app.add_event_handler("shutdown", http_client.close)
+app.add_event_handler("shutdown", janitor.stop)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,11 +28,17 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
+app.add_middleware(querycount.QueryCountMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiler.ProfilerMiddleware)
 
 app.include_router(user.router)
 app.include_router(auth.router)
 app.include_router(profile.router)
 app.include_router(application.router)
+app.include_router(reference.router)
+app.include_router(metrics.router)
+app.include_router(profiler.router)
 
 frontend.init(app)
 
@@ -0,0 +1,230 @@
+"""In-process metrics served at /metrics in the Prometheus text exposition format.
+
+Histograms and gauges are plain dicts keyed by label values, updated from the
+event loop, so there is no client library to install. Values that already
+live elsewhere (pool state, connected NiceGUI clients, cache hit counts) are
+read by collectors at scrape time instead of being mirrored here.
+
+    curl -s localhost:8000/metrics
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Mount
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'  # Starlette appends the charset
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, *label_values) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def timed(self, *label_values):
+        """Decorator timing each call of a coroutine function."""
+        def decorator(function):
+            @wraps(function)
+            async def wrapper(*args, **kwargs):
+                with self.time(*label_values):
+                    return await function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, label_values)} {_number(series[-1])}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, label_values)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_labels(self.label_names, label_values)} {_number(value)}')
+        return lines
+
+
+def sample(name: str, kind: str, help: str, values: Dict[tuple, float], labels: Tuple[str, ...] = ()) -> List[str]:
+    """Render a metric whose values are read at scrape time; `values` maps label values to numbers."""
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+    for label_values, value in values.items():
+        lines.append(f'{name}{_labels(labels, label_values)} {_number(value)}')
+    return lines
+
+
+request_duration = Histogram('http_request_duration_seconds', 'HTTP request latency by route template.',
+                             labels=('method', 'route', 'status'))
+requests_in_flight = Gauge('http_requests_in_flight', 'HTTP requests currently being handled.', labels=('method',))
+pool_checkout_duration = Histogram('db_pool_checkout_seconds', 'Time spent waiting for a pooled database connection.',
+                                   buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0))
+stats_duration = Histogram('firm_stats_seconds', 'Time spent computing or loading firm statistics.',
+                           labels=('operation',))
+
+METRICS = [request_duration, requests_in_flight, pool_checkout_duration, stats_duration]
+
+# Callables returning exposition lines, run on every scrape (see collect_runtime below)
+collectors: List[Callable[[], List[str]]] = []
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in collectors:
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
+
+
+def collect_runtime() -> List[str]:
+    # Imported here: these modules import this one for their own timings
+    from nicegui import Client
+
+    from . import janitor, oauth2
+    from .database import engine
+
+    pool = engine.sync_engine.pool
+    auth = oauth2.auth_cache_stats()
+    lines = sample('db_pool_connections', 'gauge', 'Database connections by state.', {
+        ('checked_out',): pool.checkedout(),
+        ('checked_in',): pool.checkedin(),
+        ('overflow',): max(pool.overflow(), 0),
+    }, labels=('state',))
+    lines += sample('db_pool_size', 'gauge', 'Configured database pool size.', {(): pool.size()})
+    lines += sample('nicegui_clients', 'gauge', 'NiceGUI clients by websocket state.', {
+        ('connected',): sum(client.has_socket_connection for client in Client.instances.values()),
+        ('total',): len(Client.instances),
+    }, labels=('state',))
+    lines += sample('auth_cache_requests_total', 'counter', 'Authenticated-user lookups by outcome.', {
+        ('hit',): auth['cache_hits'],
+        ('miss',): auth['db_lookups'],
+        ('claims',): auth['claims_only'],
+    }, labels=('result',))
+    lines += sample('janitor_reclaimed_total', 'counter', 'Blank applications deleted by the janitor.',
+                    {(): janitor.janitor_stats['reclaimed_total']})
+    return lines
+
+
+collectors.append(collect_runtime)
+
+
+def _route_paths(routes, prefix: str = '') -> Dict[object, str]:
+    paths = {}
+    for route in routes:
+        path = prefix + getattr(route, 'path', '')
+        if isinstance(route, Mount) and route.routes:
+            # A mounted router stays the endpoint only when none of its own routes matched
+            paths[route.app] = 'unmatched'
+            paths.update(_route_paths(route.routes, path))
+        elif isinstance(route, Mount):
+            paths[route.app] = path
+        elif hasattr(route, 'endpoint'):
+            paths.setdefault(route.endpoint, path)
+    return paths
+
+
+class MetricsMiddleware:
+    """Time every HTTP request and label it with its route template, so /applications/123 and /applications/456 share a series."""
+
+    def __init__(self, app):
+        self.app = app
+        self._paths: Dict[object, str] = {}
+
+    def _route(self, scope, root) -> str:
+        # Routers record the matched endpoint in the scope; unmatched requests (404s) have none
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'unmatched'
+        if endpoint not in self._paths:
+            self._paths = _route_paths(root.routes)
+        return self._paths.setdefault(endpoint, 'other')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        root = scope['app']  # the mounted NiceGUI app replaces it further down
+        status = 500
+        method = scope['method']
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        requests_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec(method)
+            request_duration.observe(time.perf_counter() - start, method, self._route(scope, root), str(status))
+
+
+router = APIRouter(tags=['Metrics'])
+
+
+@router.get('/metrics', include_in_schema=False, response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
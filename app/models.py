@@ -1,4 +1,4 @@
-from sqlalchemy import ARRAY, Boolean, Column, Date, String, DateTime, Integer, ForeignKey, func, UniqueConstraint, Text
+from sqlalchemy import ARRAY, BigInteger, Boolean, Column, Date, Float, String, DateTime, Index, Integer, ForeignKey, func, text, UniqueConstraint, Text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.event import listens_for
@@ -59,7 +59,8 @@ def create_initial_application(mapper, connection, target):
 class Application(Base):
     __tablename__ = 'applications'
 
-    application_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    # Allocated by next_application_id(): a sequence run through a Feistel permutation, so IDs are unique without being sequential
+    application_id = Column(Integer, primary_key=True, index=True, autoincrement=False, server_default=text('next_application_id()'))
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.user_id', ondelete='CASCADE'))
     firm = Column(String, nullable=True)
     city = Column(String, nullable=True)
@@ -80,4 +81,92 @@ class Application(Base):
 
     user = relationship("User", back_populates="applications")
 
-    __table_args__ = (UniqueConstraint('user_id', 'firm', 'city', name='_user_firm_city_uc'),)
\ No newline at end of file
+    __table_args__ = (
+        UniqueConstraint('user_id', 'firm', 'city', name='_user_firm_city_uc'),
+        # Firm stats aggregate every row of the requested firms (firm IN (...)) in one pass.
+        Index('ix_applications_firm_stage', 'firm', 'stage'),
+        # /applications/me lists a user's non-blank rows, newest first.
+        Index('ix_applications_user_last_updated', 'user_id', last_updated.desc(), postgresql_where=firm.isnot(None)),
+        # The janitor looks for old blank rows (no firm, no city) across all users.
+        Index('ix_applications_blank_last_updated', last_updated, postgresql_where=firm.is_(None) & city.is_(None)),
+    )
+
+
+# Kept in step with alembic revision c3f8a2d5e6b1 for databases built with create_all
+APPLICATION_ID_DDL = [
+    "CREATE SEQUENCE IF NOT EXISTS application_id_seq AS bigint MAXVALUE 1073741823",
+    """
+    CREATE OR REPLACE FUNCTION permute_application_id(value bigint) RETURNS integer AS $$
+    DECLARE
+        l1 integer := (value >> 15) & 32767;
+        r1 integer := value & 32767;
+        l2 integer;
+        r2 integer;
+    BEGIN
+        -- Three-round Feistel network over 30 bits; a bijection, so distinct inputs give distinct IDs
+        FOR i IN 1..3 LOOP
+            l2 := r1;
+            r2 := l1 # ((((1366 * r1 + 150889) % 714025) / 714025.0) * 32767)::integer;
+            l1 := l2;
+            r1 := r2;
+        END LOOP;
+        RETURN (r1 << 15) + l1;
+    END;
+    $$ LANGUAGE plpgsql IMMUTABLE STRICT
+    """,
+    """
+    CREATE OR REPLACE FUNCTION next_application_id() RETURNS integer AS $$
+    DECLARE
+        candidate integer;
+    BEGIN
+        LOOP
+            candidate := 100000000 + permute_application_id(nextval('application_id_seq'));
+            -- Rows from the old random allocator share this range; skip any ID they already hold
+            EXIT WHEN NOT EXISTS (SELECT 1 FROM applications WHERE application_id = candidate);
+        END LOOP;
+        RETURN candidate;
+    END;
+    $$ LANGUAGE plpgsql VOLATILE
+    """,
+]
+
+
+@listens_for(Application.__table__, 'before_create')
+def create_application_id_function(target, connection, **kw):
+    for statement in APPLICATION_ID_DDL:
+        connection.execute(text(statement))
+
+
+class AppCounter(Base):
+    """Global totals maintained incrementally by app/counters.py."""
+    __tablename__ = 'app_counters'
+
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, server_default=func.timezone('UTC', func.now()))
+
+
+class FirmStats(Base):
+    """Precomputed firm-wide aggregates, refreshed whenever an application for the firm changes."""
+    __tablename__ = 'firm_stats'
+
+    firm = Column(String, primary_key=True)
+    total_users_for_firm = Column(Integer, nullable=False, default=0)
+    total_applications = Column(Integer, nullable=False, default=0)
+    successful_applications = Column(Integer, nullable=False, default=0)
+    applications_with_screener = Column(Integer, nullable=False, default=0)
+    applications_with_callback = Column(Integer, nullable=False, default=0)
+    rejections = Column(Integer, nullable=False, default=0)
+    median_applied_success = Column(Float, nullable=True)
+    median_applied_not_success = Column(Float, nullable=True)
+    median_screener_success = Column(Float, nullable=True)
+    median_screener_not_success = Column(Float, nullable=True)
+    median_callback_success = Column(Float, nullable=True)
+    median_callback_not_success = Column(Float, nullable=True)
+    screener_start = Column(Date, nullable=True)
+    callback_start = Column(Date, nullable=True)
+    offer_start = Column(Date, nullable=True)
+    refreshed_at = Column(DateTime, nullable=False, server_default=func.timezone('UTC', func.now()))
+
+    def __repr__(self):
+        return f"<FirmStats(firm='{self.firm}', total_applications='{self.total_applications}', refreshed_at='{self.refreshed_at}')>"
@@ -1,10 +1,14 @@
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
-from fastapi import Depends, status, HTTPException
+from fastapi import Depends, Response, status, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import json
+from typing import Optional
 import uuid
 
+from .cache import create_cache
 from .config import settings
 from .database import get_db
 from .models import User
@@ -31,16 +35,104 @@ def verify_token(token: str, credentials_exception) -> TokenData:
         raise credentials_exception
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    token_data = verify_token(token, credentials_exception)
 
-    user = db.query(User).filter(User.user_id == uuid.UUID(token_data.id)).first()
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """The fields of `User` that request handlers read, detached from any session."""
+    user_id: uuid.UUID
+    email: str
+    created_at: datetime
+    is_active: Optional[bool] = False
+
+    @classmethod
+    def from_row(cls, user: User) -> 'CurrentUser':
+        return cls(user_id=user.user_id, email=user.email, created_at=user.created_at, is_active=user.is_active)
+
+
+def _dumps_user(user: CurrentUser) -> str:
+    return json.dumps(asdict(user), default=str)
+
+
+def _loads_user(raw) -> CurrentUser:
+    data = json.loads(raw)
+    return CurrentUser(user_id=uuid.UUID(data['user_id']), email=data['email'],
+                       created_at=datetime.fromisoformat(data['created_at']), is_active=data['is_active'])
+
+
+# Token subject -> CurrentUser. Kept short-lived; changes to the user call invalidate_user.
+current_user_cache = create_cache(settings.user_cache_size, settings.user_cache_ttl, settings.redis_url,
+                                  prefix="current_user:", dumps=_dumps_user, loads=_loads_user)
+
+# DB lookups done and avoided by the dependencies below; the X-Auth-Cache header reports the per-request outcome
+auth_counters = {"cache_hits": 0, "db_lookups": 0, "claims_only": 0}
+
+
+async def invalidate_user(user_id: uuid.UUID):
+    """Drop the cached snapshot for `user_id`; call after the transaction that changed the user commits."""
+    await current_user_cache.delete(str(user_id))
+
+
+async def get_current_user(response: Response, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> CurrentUser:
+    """Resolve the token to a user snapshot, from the cache when possible."""
+    token_data = verify_token(token, _credentials_exception())
+
+    user = await current_user_cache.get(token_data.id)
+    if user is not None:
+        auth_counters["cache_hits"] += 1
+        response.headers["X-Auth-Cache"] = "hit"
+        return user
+
+    row = await db.get(User, uuid.UUID(token_data.id))
+    auth_counters["db_lookups"] += 1
+    response.headers["X-Auth-Cache"] = "miss"
+    if row is None:
+        raise _credentials_exception()
+
+    user = CurrentUser.from_row(row)
+    await current_user_cache.set(token_data.id, user)
+    return user
+
+
+async def get_current_user_row(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    """Load the `User` row itself, for handlers that modify or delete it."""
+    token_data = verify_token(token, _credentials_exception())
+
+    user = await db.get(User, uuid.UUID(token_data.id))
+    auth_counters["db_lookups"] += 1
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     return user
+
+
+async def get_current_user_id(response: Response, token: str = Depends(oauth2_scheme)) -> uuid.UUID:
+    """Claims-only: trust the signed token's subject without checking the user still exists.
+
+    Only for read endpoints scoped by user_id, where a deleted user simply finds nothing.
+    """
+    token_data = verify_token(token, _credentials_exception())
+    auth_counters["claims_only"] += 1
+    response.headers["X-Auth-Cache"] = "claims"
+    return uuid.UUID(token_data.id)
+
+
+def auth_cache_stats() -> dict:
+    return {**auth_counters, "db_lookups_saved": auth_counters["cache_hits"] + auth_counters["claims_only"],
+            "cache": current_user_cache.stats()}
+
+
+def get_user_id_from_token(token: Optional[str]) -> Optional[uuid.UUID]:
+    """Return the user id of a valid token, or None. Used by the NiceGUI pages, which keep the token in storage."""
+    if not token:
+        return None
+    try:
+        return uuid.UUID(verify_token(token, ValueError("Could not validate credentials")).id)
+    except ValueError:
+        return None
@@ -0,0 +1,242 @@
+"""Opt-in sampling profiler for individual requests.
+
+A background thread samples the event loop thread's stack (via
+`sys._current_frames`) every `profiler_interval_ms` while there are
+profiled requests in flight. A request is profiled when it carries a valid
+signed token, as the `X-Profile` header or the `profile` query parameter (for
+NiceGUI pages opened in a browser), or, when `profiler_slow_ms` is set, when it
+turns out slower than that. In that mode every request is sampled, and only
+the slow ones are kept.
+
+Each capture is written to `profiler_dir` as a collapsed-stack file (for
+flamegraph.pl and speedscope) and a speedscope JSON profile. Only the newest
+`profiler_keep` captures are kept. GET /debug/profiles lists them and
+GET /debug/profiles/{file} downloads one; both need a token too.
+
+Every request shares the one event loop thread, so a capture also contains
+whatever concurrent requests ran on the loop meanwhile. Time the loop spends
+idle in `select` is time spent waiting, on the database for example.
+
+    python -m app.profiler token   # print a token valid for profiler_token_ttl seconds
+"""
+import argparse
+import asyncio
+from collections import Counter, deque
+import hashlib
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import FileResponse
+
+from .config import settings
+
+HEADER = 'x-profile'
+QUERY_PARAMETER = 'profile'
+# Samples kept in auto mode, where the sampler runs whenever any request is in flight
+BUFFER_SECONDS = 120
+
+Stack = Tuple[str, ...]
+
+
+def sign_token(expires: Optional[int] = None) -> str:
+    """'<expiry>.<hmac>', valid until the unix time `expires` (default: profiler_token_ttl from now)."""
+    expires = expires or int(time.time()) + settings.profiler_token_ttl
+    signature = hmac.new(settings.secret_key.encode(), f"profile:{expires}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_token(token: Optional[str]) -> bool:
+    if not token or '.' not in token:
+        return False
+    expires, _, signature = token.partition('.')
+    # isdigit() alone accepts digits like '²' that int() rejects
+    if not (expires.isascii() and expires.isdigit()) or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sign_token(int(expires)).partition('.')[2], signature)
+
+
+class Sampler:
+    """Samples one thread's stack on a daemon thread while at least one caller has armed it."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Deque[Tuple[float, Stack]] = deque(maxlen=int(BUFFER_SECONDS / interval))
+        self._armed = 0
+        self._target: Optional[int] = None
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[object, str] = {}
+
+    def arm(self):
+        self._target = threading.get_ident()
+        self._armed += 1
+        self._wake.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+            self._thread.start()
+
+    def disarm(self):
+        self._armed -= 1
+        if not self._armed:
+            self._wake.clear()
+
+    def between(self, start: float, end: float) -> List[Stack]:
+        return [stack for at, stack in list(self.samples) if start <= at <= end]
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            for prefix in sorted(sys.path, key=len, reverse=True):
+                if prefix and path.startswith(prefix + os.sep):
+                    path = path[len(prefix) + 1:]
+                    break
+            label = self._labels[code] = f"{code.co_name} ({path}:{code.co_firstlineno})"
+        return label
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self.samples.append((time.perf_counter(), tuple(reversed(stack))))
+            del frame
+            time.sleep(self.interval)
+
+
+sampler = Sampler(settings.profiler_interval_ms / 1000)
+
+
+def collapsed(stacks: List[Stack]) -> str:
+    return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in Counter(stacks).most_common())
+
+
+def speedscope(stacks: List[Stack], name: str) -> dict:
+    frames: Dict[str, int] = {}
+    samples = [[frames.setdefault(label, len(frames)) for label in stack] for stack in stacks]
+    interval_ms = settings.profiler_interval_ms
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": [{"name": label} for label in frames]},
+        "profiles": [{
+            "type": "sampled", "name": name, "unit": "milliseconds",
+            "startValue": 0, "endValue": len(samples) * interval_ms,
+            "samples": samples, "weights": [interval_ms] * len(samples),
+        }],
+        "name": name,
+        "exporter": "app.profiler",
+    }
+
+
+def _write_capture(method: str, path: str, duration_ms: float, trigger: str, stacks: List[Stack]):
+    os.makedirs(settings.profiler_dir, exist_ok=True)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', path).strip('-') or 'root'
+    base = f"{datetime.utcnow():%Y%m%dT%H%M%S.%f}-{method}-{slug[:60]}-{duration_ms:.0f}ms"
+    name = f"{method} {path} {duration_ms:.0f} ms ({trigger})"
+    with open(os.path.join(settings.profiler_dir, base + '.collapsed'), 'w') as f:
+        f.write(collapsed(stacks))
+    with open(os.path.join(settings.profiler_dir, base + '.speedscope.json'), 'w') as f:
+        json.dump(speedscope(stacks, name), f)
+    with open(os.path.join(settings.profiler_dir, base + '.meta.json'), 'w') as f:
+        json.dump({"method": method, "path": path, "duration_ms": round(duration_ms, 1), "trigger": trigger,
+                   "samples": len(stacks), "captured_at": datetime.utcnow().isoformat()}, f)
+
+    # Rotate: keep the newest profiler_keep captures (names sort by time)
+    captures = sorted(file_name[:-len('.meta.json')] for file_name in os.listdir(settings.profiler_dir)
+                      if file_name.endswith('.meta.json'))
+    for stale in captures[:-settings.profiler_keep]:
+        for suffix in ('.collapsed', '.speedscope.json', '.meta.json'):
+            try:
+                os.remove(os.path.join(settings.profiler_dir, stale + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _requested(scope) -> bool:
+    for name, value in scope.get('headers', ()):
+        if name == HEADER.encode():
+            return verify_token(value.decode('latin-1'))
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(QUERY_PARAMETER)
+    return bool(values) and verify_token(values[0])
+
+
+class ProfilerMiddleware:
+    """Sample requests that ask for it with a token, or all requests when profiler_slow_ms is set, and save the profiles."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        requested = _requested(scope)
+        slow_ms = settings.profiler_slow_ms
+        if not requested and not slow_ms:
+            return await self.app(scope, receive, send)
+
+        sampler.arm()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            end = time.perf_counter()
+            sampler.disarm()
+            duration_ms = (end - start) * 1000
+            if requested or duration_ms >= slow_ms:
+                stacks = sampler.between(start, end)
+                if stacks:
+                    await asyncio.to_thread(_write_capture, scope['method'], scope['path'], duration_ms,
+                                            'requested' if requested else 'slow', stacks)
+
+
+router = APIRouter(prefix='/debug/profiles', tags=['Debug'])
+
+
+def _authorize(request: Request):
+    if not verify_token(request.headers.get(HEADER) or request.query_params.get(QUERY_PARAMETER)):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="A valid profiler token is required")
+
+
+@router.get('', include_in_schema=False)
+def list_captures(request: Request):
+    _authorize(request)
+    if not os.path.isdir(settings.profiler_dir):
+        return []
+    captures = []
+    for name in sorted(os.listdir(settings.profiler_dir), reverse=True):
+        if name.endswith('.meta.json'):
+            base = name[:-len('.meta.json')]
+            with open(os.path.join(settings.profiler_dir, name)) as f:
+                meta = json.load(f)
+            captures.append({**meta, "collapsed": f"{router.prefix}/{base}.collapsed",
+                             "speedscope": f"{router.prefix}/{base}.speedscope.json"})
+    return captures
+
+
+@router.get('/{file_name}', include_in_schema=False)
+def get_capture(file_name: str, request: Request):
+    _authorize(request)
+    path = os.path.join(settings.profiler_dir, os.path.basename(file_name))
+    if not file_name.endswith(('.collapsed', '.speedscope.json')) or not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Capture not found")
+    return FileResponse(path, media_type='application/json' if file_name.endswith('.json') else 'text/plain')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Request profiler utilities.")
+    parser.add_argument("command", choices=["token"])
+    parser.parse_args()
+    print(sign_token())
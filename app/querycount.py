@@ -0,0 +1,139 @@
+"""Per-request SQL statement counting.
+
+Cursor events on the engine add every statement to the trackers active in the
+current context. `QueryCountMiddleware` opens one tracker per HTTP request
+and reports it in the `X-DB-Queries` and `Server-Timing` response headers
+(for streamed responses, up to the point the headers are sent). A statement
+repeated `query_repeat_warning` times in one request is logged as a likely
+N+1. `query_budget` opens a tracker around any block and fails when the
+block issues more statements than allowed:
+
+    with query_budget(3):
+        response = await client.get('/applications/me')
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import event
+
+from .config import settings
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: Optional[str] = None
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.statements[statement] += 1
+        if duration_ms > self.slowest_ms:
+            self.slowest_ms = duration_ms
+            self.slowest_statement = statement
+
+    def repeated(self, threshold: int):
+        """Statements issued at least `threshold` times, most frequent first."""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def server_timing(self) -> str:
+        timing = f'db;dur={self.total_ms:.1f};desc="{self.count} queries"'
+        if self.count:
+            timing += f', db-slowest;dur={self.slowest_ms:.1f}'
+        return timing
+
+
+# Trackers are nested (a query_budget around an in-process request sees the request's statements too)
+_active: ContextVar[Tuple[QueryStats, ...]] = ContextVar('querycount_active', default=())
+
+
+@contextmanager
+def track() -> Iterator[QueryStats]:
+    stats = QueryStats()
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+def current() -> Optional[QueryStats]:
+    """The innermost tracker in this context, if any."""
+    active = _active.get()
+    return active[-1] if active else None
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('querycount_start', []).append(time.perf_counter())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - conn.info['querycount_start'].pop()) * 1000
+    for stats in _active.get():
+        stats.record(statement, duration_ms)
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start time so the next one pairs up
+    starts = context.connection.info.get('querycount_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, budget: int, stats: QueryStats):
+        lines = [f"{count} x {statement}" for statement, count in stats.statements.most_common(5)]
+        super().__init__(f"Expected at most {budget} queries, got {stats.count}. Most frequent:\n" + "\n".join(lines))
+        self.budget = budget
+        self.stats = stats
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """Raise QueryBudgetExceeded if the block issues more than `max_queries` statements."""
+    with track() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(max_queries, stats)
+
+
+class QueryCountMiddleware:
+    """Count the statements each HTTP request issues and report them in its response headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        with track() as stats:
+            async def send_with_headers(message):
+                if message['type'] == 'http.response.start':
+                    headers = list(message.get('headers', []))
+                    headers.append((b'x-db-queries', str(stats.count).encode()))
+                    headers.append((b'server-timing', stats.server_timing().encode()))
+                    message = {**message, 'headers': headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+
+        repeated = stats.repeated(settings.query_repeat_warning)
+        if repeated:
+            statement, count = repeated[0]
+            logger.warning("%s %s issued %d queries; repeated %d times: %s",
+                           scope['method'], scope['path'], stats.count, count, ' '.join(statement.split())[:200])
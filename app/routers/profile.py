@@ -1,9 +1,8 @@
-from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+import uuid
 
-from .. import models, schemas, oauth2
+from .. import schemas, oauth2, services
 from ..database import get_db
 
 router = APIRouter(
@@ -13,29 +12,18 @@ router = APIRouter(
 
 # Endpoint to retrieve the profile of the current user
 @router.get("/me", response_model=schemas.ProfileResponse, status_code=status.HTTP_200_OK)
-async def get_current_user_profile(current_user: models.User = Depends(oauth2.get_current_user), db: Session = Depends(get_db)):
-    profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.user_id).first()
+async def get_current_user_profile(user_id: uuid.UUID = Depends(oauth2.get_current_user_id), db: AsyncSession = Depends(get_db)):
+    profile = await services.get_profile(db, user_id)
     if not profile:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
     return profile
 
 # Endpoint to update the profile of the current user
 @router.put("/me", response_model=schemas.MessageResponse, status_code=status.HTTP_200_OK)
-async def update_current_user_profile(profile_data: schemas.ProfileUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    profile = db.query(models.Profile).filter(models.Profile.user_id == current_user.user_id).first()
-    if not profile:
+async def update_current_user_profile(profile_data: schemas.ProfileUpdate, db: AsyncSession = Depends(get_db), current_user: oauth2.CurrentUser = Depends(oauth2.get_current_user)):
+    if not await services.update_profile(db, current_user.user_id, profile_data):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
 
-    # Update profile details
-    if profile_data.school is not None:
-        profile.school = profile_data.school
-    if profile_data.rank is not None:
-        profile.rank = profile_data.rank
-    if profile_data.circumstances is not None:
-        profile.circumstances = profile_data.circumstances
-
-    profile.last_updated = datetime.utcnow()  # Manually update the last_updated field
-    db.commit()
     return schemas.MessageResponse(message="Profile updated successfully")
 
 
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Query, status
+from typing import List, Literal
+
+from .. import loader, schemas
+
+router = APIRouter(
+    prefix="/reference",
+    tags=['Reference']
+)
+
+
+# Typeahead over the firm, city and school lists
+@router.get("/search", response_model=List[schemas.ReferenceMatch], status_code=status.HTTP_200_OK)
+async def search_reference(kind: Literal['firm', 'city', 'school'], q: str = '', limit: int = Query(10, ge=1, le=100)):
+    return [match._asdict() for match in loader.search(kind, q, limit)]
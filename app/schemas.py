@@ -4,10 +4,7 @@ from sqlalchemy import func
 from typing import List, Optional, Dict
 import uuid
 
-from .loader import load_law_schools, load_cities
-
-law_schools = load_law_schools()['School'].tolist()
-cities = load_cities()
+from . import loader
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -54,7 +51,7 @@ class ProfileBase(BaseModel):
 
     @validator('school', pre=True, allow_reuse=True)
     def validate_school(cls, value):
-        if value is not None and value not in law_schools:
+        if value is not None and value not in loader.law_schools.get().members:
             raise ValueError(f'School "{value}" is not in the list of law schools')
         return value
 
@@ -106,7 +103,7 @@ class ApplicationBase(BaseModel):
     def validate_city(cls, value):
         if value is None:
             return value
-        if value not in cities:
+        if value not in loader.cities.get().members:
             raise ValueError(f'City "{value}" is not in the list of valid cities')
         return value
 
@@ -119,11 +116,30 @@ class ApplicationCreate(ApplicationBase):
 class ApplicationUpdate(ApplicationBase):
     pass
 
+class ApplicationUpsert(ApplicationBase):
+    # Both are part of the conflict key; NULLs never conflict, so they are required here
+    firm: str
+    city: str
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class ImportReport(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: List[ImportRowError]
+
 class ApplicationResponse(ApplicationBase):
     application_id: int
     user_id: uuid.UUID
     last_updated: Optional[datetime] = None
 
+class ReferenceMatch(BaseModel):
+    value: str
+    score: float
+
 class MedianResponse(BaseModel):
     success: Optional[float] = Field(None, description="Median days for successful response")
     not_success: Optional[float] = Field(None, description="Median days for unsuccessful response")
@@ -0,0 +1,94 @@
+"""In-memory typeahead index over a fixed list of strings.
+
+Prefix matches (on the whole value or on any word in it) are found by
+bisecting a sorted list of keys. Trigram similarity, padded per word like
+pg_trgm, catches typos when there are not enough prefix matches. It is
+scored by how much of the query's trigrams a value covers, so a short
+query is not diluted by long multi-word values.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+import re
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Tuple
+
+PREFIX_SCORE = 0.9
+WORD_PREFIX_SCORE = 0.75
+TRIGRAM_WEIGHT = 0.6
+MIN_SIMILARITY = 0.5
+MIN_FUZZY_LENGTH = 3
+
+_WORD = re.compile(r'\w+')
+
+
+class Match(NamedTuple):
+    value: str
+    score: float
+
+
+def normalize(text: str) -> str:
+    return ' '.join(_WORD.findall(text.lower()))
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class SearchIndex:
+    def __init__(self, values: Iterable[str]):
+        self.values: Tuple[str, ...] = tuple(values)
+
+        # One key per word start, so 'wat' finds 'Latham & Watkins'; word == 0 marks the start of the value
+        entries = []
+        for position, value in enumerate(self.values):
+            words = normalize(value).split()
+            for word in range(len(words)):
+                entries.append((' '.join(words[word:]), word, position))
+        entries.sort()
+        self._keys = [key for key, _, _ in entries]
+        self._entries = [(word, position) for _, word, position in entries]
+
+        self._grams = [trigrams(value) for value in self.values]
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for position, grams in enumerate(self._grams):
+            for gram in grams:
+                postings[gram].append(position)
+        self._postings = {gram: tuple(positions) for gram, positions in postings.items()}
+
+    def __len__(self):
+        return len(self.values)
+
+    def search(self, query: str, limit: int = 10) -> List[Match]:
+        """Return up to `limit` values matching `query`, best first. An empty query lists values in order."""
+        needle = normalize(query)
+        if not needle:
+            return [Match(value, 0.0) for value in self.values[:limit]]
+
+        scores: Dict[int, float] = {}
+        for index in range(bisect_left(self._keys, needle), len(self._keys)):
+            key = self._keys[index]
+            if not key.startswith(needle):
+                break
+            word, position = self._entries[index]
+            if word == 0:
+                score = 1.0 if key == needle else PREFIX_SCORE
+            else:
+                score = WORD_PREFIX_SCORE
+            scores[position] = max(score, scores.get(position, 0.0))
+
+        if len(scores) < limit and len(needle) >= MIN_FUZZY_LENGTH:
+            query_grams = trigrams(needle)
+            shared: Dict[int, int] = defaultdict(int)
+            for gram in query_grams:
+                for position in self._postings.get(gram, ()):
+                    shared[position] += 1
+            for position, count in shared.items():
+                similarity = count / len(query_grams)
+                if similarity >= MIN_SIMILARITY and position not in scores:
+                    scores[position] = round(TRIGRAM_WEIGHT * similarity, 4)
+
+        best = sorted(scores.items(), key=lambda item: (-item[1], len(self.values[item[0]]), self.values[item[0]]))
+        return [Match(self.values[position], score) for position, score in best[:limit]]
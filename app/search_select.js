@@ -0,0 +1,24 @@
+// ui.select's select.js filters the options again in the browser, keeping only those
+// containing the typed text. The server already sent the best matches for it, and a
+// fuzzy match ("Skadden" for "skaden") need not contain it, so show them as they are.
+export default {
+  props: ["options"],
+  template: `
+    <q-select
+      ref="qRef"
+      v-bind="$attrs"
+      :options="options"
+      @filter="filterFn"
+    >
+      <template v-for="(_, slot) in $slots" v-slot:[slot]="slotProps">
+        <slot :name="slot" v-bind="slotProps || {}" />
+      </template>
+    </q-select>
+  `,
+  methods: {
+    filterFn(val, update) {
+      // The options for `val` arrive from the server as the `options` prop
+      update();
+    },
+  },
+};
@@ -0,0 +1,94 @@
+"""orjson-backed JSON responses, and a fast path for applications with stats.
+
+`ORJSONResponse` is the app's default response class. Routes that return
+applications with summary stats skip FastAPI's response_model round trip
+(validating every field again, then jsonable_encoder) by building the payload
+from the ORM rows and the stats dicts directly and returning a response.
+The stats dicts already carry the declared types (see
+stats.build_summary_stats), and orjson encodes dates, datetimes, UUIDs and
+numpy values natively.
+
+With `validate_responses` on, the same payloads are instead validated against
+`schemas.ApplicationResponseWithStats` through TypeAdapters compiled once at
+import, which is useful for catching drift between the two in development.
+"""
+from decimal import Decimal
+from typing import Any, Iterable, List
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+import orjson
+from pydantic import TypeAdapter
+
+from . import schemas
+from .config import settings
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+APPLICATION_FIELDS = tuple(schemas.ApplicationResponse.model_fields)
+
+application_with_stats_adapter = TypeAdapter(schemas.ApplicationResponseWithStats)
+applications_with_stats_adapter = TypeAdapter(List[schemas.ApplicationResponseWithStats])
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'item'):  # numpy scalars orjson does not handle itself
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=_default, option=OPTIONS)
+
+
+def with_dependency_headers(response: Response, dependency_response: Response) -> Response:
+    """Copy headers that dependencies set on the injected `Response` (X-Auth-Cache, say) onto a returned response.
+
+    FastAPI only applies them to values it serializes itself.
+    """
+    response.headers.raw.extend(dependency_response.headers.raw)
+    return response
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def application_payload(application) -> dict:
+    return {field: getattr(application, field) for field in APPLICATION_FIELDS}
+
+
+def with_stats_payload(application_with_stats: dict) -> dict:
+    return {
+        "application": application_payload(application_with_stats["application"]),
+        "summary_stats": application_with_stats["summary_stats"],
+    }
+
+
+def dumps_with_stats(application_with_stats: dict) -> bytes:
+    if settings.validate_responses:
+        return application_with_stats_adapter.dump_json(
+            application_with_stats_adapter.validate_python(application_with_stats, from_attributes=True))
+    return dumps(with_stats_payload(application_with_stats))
+
+
+def dumps_many_with_stats(applications_with_stats: Iterable[dict]) -> bytes:
+    if settings.validate_responses:
+        return applications_with_stats_adapter.dump_json(
+            applications_with_stats_adapter.validate_python(list(applications_with_stats), from_attributes=True))
+    return dumps([with_stats_payload(item) for item in applications_with_stats])
+
+
+class WithStatsResponse(ORJSONResponse):
+    """Response for one application with stats; declare the route's response_model for the schema docs."""
+
+    def render(self, content: dict) -> bytes:
+        return dumps_with_stats(content)
+
+
+class ManyWithStatsResponse(ORJSONResponse):
+    def render(self, content: Iterable[dict]) -> bytes:
+        return dumps_many_with_stats(content)
@@ -0,0 +1,439 @@
+"""Application, profile and user operations shared by the API routers and the NiceGUI pages.
+
+Functions take an AsyncSession and plain values or schema objects, and return
+ORM rows (or None when the target does not exist / is not owned by the user).
+Translating that into HTTP errors is left to the routers.
+"""
+import base64
+from datetime import datetime
+import json
+from sqlalchemy import and_, func, insert, literal_column, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from pydantic import ValidationError
+from typing import AsyncIterator, List, Optional, Tuple
+import uuid
+
+from . import counters, models, oauth2, schemas, stats
+from .cache import create_cache
+from .config import settings
+from .database import SessionLocal
+from .utils import get_user_by_email, hash_password, password_needs_rehash, verify_password
+
+
+def as_json(schema, value) -> dict:
+    """Serialize ORM rows (or dicts holding them) exactly as the API would return them."""
+    return schema.model_validate(value, from_attributes=True).model_dump(mode='json')
+
+
+# Applications
+
+async def calculate_application_stats(application, db: AsyncSession):
+    """Attach firm-wide summary stats to `application` using a single aggregate query."""
+    firm_stats = await stats.fetch_firm_stats(db, [application.firm]) if application.firm else {}
+    return {
+        "application": application,
+        "summary_stats": stats.build_summary_stats(application, firm_stats.get(application.firm))
+    }
+
+
+async def calculate_applications_stats(applications, db: AsyncSession):
+    """Attach summary stats to many applications with one grouped query over their distinct firms."""
+    firm_stats = await stats.fetch_firm_stats(db, {application.firm for application in applications})
+    return [
+        {
+            "application": application,
+            "summary_stats": stats.build_summary_stats(application, firm_stats.get(application.firm))
+        }
+        for application in applications
+    ]
+
+
+async def create_application(db: AsyncSession, user_id: uuid.UUID, application_data: schemas.ApplicationCreate) -> models.Application:
+    # The database allocates application_id (see next_application_id()); RETURNING hands back the full row
+    new_application = await db.scalar(
+        insert(models.Application)
+        .values(user_id=user_id, **application_data.model_dump(exclude={'last_updated'}))
+        .returning(models.Application)
+    )
+
+    await stats.refresh_firm_stats(db, [new_application.firm])
+    await counters.adjust(db, total_applications=int(new_application.firm is not None))
+    await db.commit()
+    await stats.invalidate_firm_stats([new_application.firm])
+    return new_application
+
+
+async def get_or_create_blank_application(db: AsyncSession, user_id: uuid.UUID) -> models.Application:
+    """Reuse the user's newest blank application (no firm, no city), or create one.
+
+    Reusing bumps last_updated so the janitor does not reclaim a row the user is looking at.
+    """
+    A = models.Application
+    newest_blank = (
+        select(A.application_id)
+        .where(A.user_id == user_id, A.firm.is_(None), A.city.is_(None))
+        .order_by(A.last_updated.desc().nulls_last())
+        .limit(1)
+        .scalar_subquery()
+    )
+    application = await db.scalar(
+        update(A).where(A.application_id == newest_blank).values(last_updated=func.now()).returning(A),
+        execution_options={"populate_existing": True}
+    )
+    if application is None:
+        return await create_application(db, user_id, schemas.ApplicationCreate())
+
+    await db.commit()
+    return application
+
+
+class IdempotencyKeyReused(Exception):
+    """An Idempotency-Key was sent again with a different request body."""
+
+
+# (user_id, Idempotency-Key) -> the request it was first used with and the response it produced
+idempotency_cache = create_cache(settings.idempotency_cache_size, settings.idempotency_ttl, settings.redis_url,
+                                 prefix="idempotency:")
+
+
+async def upsert_application(db: AsyncSession, user_id: uuid.UUID, application_data: schemas.ApplicationUpsert,
+                             idempotency_key: Optional[str] = None) -> Tuple[dict, bool]:
+    """Insert or update the user's application for (firm, city) in one statement.
+
+    Returns the application with stats as JSON and whether it was replayed from
+    an earlier request with the same `idempotency_key`. Duplicates that race past
+    the cache still land on the same row through ON CONFLICT.
+    """
+    values = application_data.model_dump(exclude_unset=True)
+    fingerprint = application_data.model_dump_json(exclude_unset=True)
+    cache_key = f"{user_id}:{idempotency_key}"
+    if idempotency_key:
+        saved = await idempotency_cache.get(cache_key)
+        if saved is not None:
+            if saved["request"] != fingerprint:
+                raise IdempotencyKeyReused(idempotency_key)
+            return saved["response"], True
+
+    statement = pg_insert(models.Application).values(user_id=user_id, **values)
+    updates = {column: statement.excluded[column] for column in values if column not in ('firm', 'city')}
+    statement = statement.on_conflict_do_update(
+        constraint='_user_firm_city_uc',
+        set_={**updates, 'last_updated': func.now()}
+    ).returning(models.Application, literal_column('xmax = 0').label('inserted'))
+    application, inserted = (await db.execute(statement, execution_options={"populate_existing": True})).one()
+
+    await stats.refresh_firm_stats(db, [application.firm])
+    await counters.adjust(db, total_applications=int(inserted))
+    await db.commit()
+    await stats.invalidate_firm_stats([application.firm])
+
+    response = as_json(schemas.ApplicationResponseWithStats, await calculate_application_stats(application, db))
+    if idempotency_key:
+        await idempotency_cache.set(cache_key, {"request": fingerprint, "response": response})
+    return response, False
+
+
+MAX_REPORTED_ERRORS = 1000
+
+
+async def import_applications(db: AsyncSession, user_id: uuid.UUID, rows: AsyncIterator[Tuple[int, object]]) -> dict:
+    """Validate parsed upload rows and insert them in multi-row batches of `import_batch_size`.
+
+    `rows` yields `(row_number, fields)`, or `(row_number, error message)` for
+    records the reader could not parse. Rows that fail validation or that repeat
+    an existing (firm, city) are reported, not inserted. Each batch commits on
+    its own, so a failure late in a large file keeps the earlier batches.
+    """
+    report = {"received": 0, "inserted": 0, "failed": 0, "errors": []}
+    table = models.Application.__table__
+    statement = pg_insert(table).on_conflict_do_nothing(constraint='_user_firm_city_uc').returning(table.c.firm, table.c.city)
+    seen = set()
+    batch = []
+
+    def fail(row_number, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "errors": errors})
+
+    async def insert_batch():
+        inserted = {(row.firm, row.city) for row in await db.execute(statement, [values for _, values in batch])}
+        applications_with_firm = 0
+        for row_number, values in batch:
+            key = (values['firm'], values['city'])
+            if None in key or key in inserted:
+                report["inserted"] += 1
+                applications_with_firm += values['firm'] is not None
+            else:
+                fail(row_number, ["An application for this firm and city already exists"])
+
+        firms = {values['firm'] for _, values in batch}
+        await stats.refresh_firm_stats(db, firms)
+        await counters.adjust(db, total_applications=applications_with_firm)
+        await db.commit()
+        await stats.invalidate_firm_stats(firms)
+        batch.clear()
+
+    async for row_number, fields in rows:
+        report["received"] += 1
+        if isinstance(fields, str):
+            fail(row_number, [fields])
+            continue
+        try:
+            application_data = schemas.ApplicationCreate.model_validate(fields)
+        except ValidationError as e:
+            fail(row_number, [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()])
+            continue
+
+        values = {**application_data.model_dump(exclude={'last_updated'}), 'user_id': user_id}
+        key = (values['firm'], values['city'])
+        if None not in key:
+            if key in seen:
+                fail(row_number, ["Duplicate firm and city earlier in this file"])
+                continue
+            seen.add(key)
+
+        batch.append((row_number, values))
+        if len(batch) >= settings.import_batch_size:
+            await insert_batch()
+
+    if batch:
+        await insert_batch()
+    report["errors"].sort(key=lambda error: error["row"])
+    return report
+
+
+async def stream_applications(user_id: uuid.UUID) -> AsyncIterator[List[models.Application]]:
+    """Yield the user's applications in batches from a server-side cursor.
+
+    Opens its own session, so it can outlive the request's dependencies while a
+    StreamingResponse is being sent.
+    """
+    async with SessionLocal() as db:
+        result = await db.stream_scalars(
+            select(models.Application)
+            .where(models.Application.user_id == user_id, models.Application.firm.isnot(None))
+            .order_by(models.Application.application_id)
+            .execution_options(yield_per=settings.export_batch_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+
+
+def encode_cursor(application: models.Application) -> str:
+    position = [application.last_updated.isoformat() if application.last_updated else None, application.application_id]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    try:
+        last_updated, application_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return (datetime.fromisoformat(last_updated) if last_updated else None), int(application_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def applications_page_query(user_id: uuid.UUID, limit: int, cursor: Optional[str] = None):
+    """The statement behind list_applications_page: up to `limit` rows after `cursor`.
+
+    Keyset pagination on (last_updated, application_id), in the order of
+    ix_applications_user_last_updated: DESC puts NULL last_updated rows first.
+    Raises ValueError for a malformed cursor.
+    """
+    A = models.Application
+    applications_query = select(A).where(A.user_id == user_id, A.firm.isnot(None)).order_by(
+        A.last_updated.desc().nulls_first(), A.application_id.desc()
+    )
+
+    if cursor is not None:
+        last_updated, application_id = decode_cursor(cursor)
+        if last_updated is None:
+            after_cursor = or_(A.last_updated.isnot(None), and_(A.last_updated.is_(None), A.application_id < application_id))
+        else:
+            after_cursor = or_(A.last_updated < last_updated, and_(A.last_updated == last_updated, A.application_id < application_id))
+        applications_query = applications_query.where(after_cursor)
+
+    return applications_query.limit(limit)
+
+
+async def list_applications_page(db: AsyncSession, user_id: uuid.UUID, limit: int,
+                                 cursor: Optional[str] = None) -> Tuple[List[models.Application], Optional[str]]:
+    """Return one page of the user's applications that have a firm, newest first, and the cursor for the next page."""
+    # One extra row tells us whether there is a next page without a COUNT
+    applications = (await db.scalars(applications_page_query(user_id, limit + 1, cursor))).all()
+    if len(applications) > limit:
+        return applications[:limit], encode_cursor(applications[limit - 1])
+    return applications, None
+
+
+async def iter_applications_with_stats(db: AsyncSession, applications) -> AsyncIterator[dict]:
+    """Yield each application with its summary stats as soon as its firm's stats are available.
+
+    Unlike calculate_applications_stats this fetches per firm, trading one
+    grouped query for early output when streaming.
+    """
+    firm_stats = {}
+    for application in applications:
+        if application.firm and application.firm not in firm_stats:
+            firm_stats.update(await stats.fetch_firm_stats(db, [application.firm]))
+        yield {
+            "application": application,
+            "summary_stats": stats.build_summary_stats(application, firm_stats.get(application.firm))
+        }
+
+
+async def iter_user_applications_with_stats(db: AsyncSession, user_id: uuid.UUID) -> AsyncIterator[dict]:
+    """All of the user's applications with stats, page by page, for the /me page."""
+    cursor = None
+    while True:
+        applications, cursor = await list_applications_page(db, user_id, settings.applications_page_size, cursor)
+        async for application_with_stats in iter_applications_with_stats(db, applications):
+            yield application_with_stats
+        if cursor is None:
+            return
+
+
+async def get_application(db: AsyncSession, user_id: uuid.UUID, application_id: int) -> Optional[dict]:
+    application = await db.scalar(select(models.Application).where(models.Application.user_id == user_id, models.Application.application_id == application_id))
+    if not application:
+        return None
+    return await calculate_application_stats(application, db)
+
+
+async def update_application(db: AsyncSession, user_id: uuid.UUID, application_id: int, application_data: schemas.ApplicationUpdate) -> Optional[dict]:
+    """Apply the fields set (and non-null) in `application_data` and return the application with fresh stats.
+
+    Fields left out of the request keep their stored value, so partial updates
+    no longer reset `stage` to the schema default.
+    """
+    application = await db.scalar(select(models.Application).where(models.Application.application_id == application_id,
+                                                                   models.Application.user_id == user_id))
+    if not application:
+        return None
+
+    previous_firm = application.firm
+
+    # Update the application with the provided data
+    for var, value in application_data.model_dump(exclude_unset=True).items():
+        setattr(application, var, value) if value is not None else None
+
+    await db.flush()
+    await stats.refresh_firm_stats(db, [previous_firm, application.firm])
+    await counters.adjust(db, total_applications=(application.firm is not None) - (previous_firm is not None))
+    await db.commit()
+    await stats.invalidate_firm_stats([previous_firm, application.firm])
+    await db.refresh(application)
+
+    return await calculate_application_stats(application, db)
+
+
+async def delete_application(db: AsyncSession, application_id: int) -> bool:
+    application = await db.get(models.Application, application_id)
+    if not application:
+        return False
+
+    await db.delete(application)
+    await db.flush()
+    await stats.refresh_firm_stats(db, [application.firm])
+    await counters.adjust(db, total_applications=-int(application.firm is not None))
+    await db.commit()
+    await stats.invalidate_firm_stats([application.firm])
+    return True
+
+
+async def get_totals(db: AsyncSession) -> dict:
+    """Applications with a firm and registered users, read from the counters the writes above maintain."""
+    totals = await counters.read(db)
+    return {
+        "total_applications": totals[counters.TOTAL_APPLICATIONS],
+        "total_users": totals[counters.TOTAL_USERS]
+    }
+
+
+# Profiles
+
+async def get_profile(db: AsyncSession, user_id: uuid.UUID) -> Optional[models.Profile]:
+    # ProfileResponse nests the user, so load it up front rather than lazily during serialization
+    return await db.scalar(select(models.Profile).options(joinedload(models.Profile.user)).where(models.Profile.user_id == user_id))
+
+
+async def update_profile(db: AsyncSession, user_id: uuid.UUID, profile_data: schemas.ProfileUpdate) -> bool:
+    profile = await db.get(models.Profile, user_id)
+    if not profile:
+        return False
+
+    # Update profile details
+    if profile_data.school is not None:
+        profile.school = profile_data.school
+    if profile_data.rank is not None:
+        profile.rank = profile_data.rank
+    if profile_data.circumstances is not None:
+        profile.circumstances = profile_data.circumstances
+
+    profile.last_updated = datetime.utcnow()  # Manually update the last_updated field
+    await db.commit()
+    return True
+
+
+# Users
+
+async def create_user(db: AsyncSession, user_data: schemas.UserCreate) -> Optional[models.User]:
+    """Create a user, or return None if the email is already registered."""
+    if await get_user_by_email(user_data.email, db):
+        return None
+
+    new_user_data = user_data.dict()
+    new_user_data['password'] = await hash_password(user_data.password)
+
+    new_user = models.User(**new_user_data)
+    db.add(new_user)
+    await db.flush()
+    await counters.adjust(db, total_users=1)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+
+async def update_user(db: AsyncSession, user: models.User, update_data: schemas.UserUpdate):
+    if update_data.email is not None:
+        user.email = update_data.email
+    if update_data.password is not None:
+        user.password = await hash_password(update_data.password)
+
+    await db.commit()
+    await oauth2.invalidate_user(user.user_id)
+
+
+async def delete_user(db: AsyncSession, user: models.User):
+    A = models.Application
+    firm_counts = dict((await db.execute(select(A.firm, func.count()).where(A.user_id == user.user_id).group_by(A.firm))).all())
+    firms = list(firm_counts)
+
+    # Delete the user
+    await db.delete(user)
+    await db.flush()
+    await stats.refresh_firm_stats(db, firms)
+    await counters.adjust(db, total_users=-1,
+                          total_applications=-sum(count for firm, count in firm_counts.items() if firm is not None))
+    await db.commit()
+    await stats.invalidate_firm_stats(firms)
+    await oauth2.invalidate_user(user.user_id)
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[models.User]:
+    """Return the user if the credentials match.
+
+    Blank applications are left to the janitor (app/janitor.py), so a normal
+    login only reads. The one exception: a hash made with an outdated cost
+    factor is replaced while the plain password is at hand.
+    """
+    user = await db.scalar(select(models.User).where(models.User.email == email))
+    if not user or not user.password or not await verify_password(password, user.password):
+        return None
+
+    if password_needs_rehash(user.password):
+        user.password = await hash_password(password)
+        await db.commit()
+    return user
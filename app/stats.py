@@ -0,0 +1,369 @@
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta
+import json
+from sqlalchemy import and_, case, delete, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, Optional
+
+from . import models
+from .cache import create_cache
+from .config import settings
+from .metrics import stats_duration
+
+A = models.Application
+FS = models.FirmStats
+
+SUCCESS_STAGES = ["Screener Invite", "Callback Invite", "Offer"]
+# What a NULL stage is reported as; SummaryStats.current_stage is not nullable
+DEFAULT_STAGE = "Not Submitted"
+
+# Which recent-response counter applies to an application at a given stage.
+RECENT_COUNTER_BY_STAGE = {
+    "Submitted Application": "recent_applied",
+    "Screener Invite": "recent_screener",
+    "Callback Invite": "recent_callback",
+    "Not Submitted": "recent_any",
+    "Offer": "recent_any",
+    "Rejection": "rejections",
+}
+
+
+def _count(condition=None):
+    if condition is None:
+        return func.count()
+    return func.count().filter(condition)
+
+
+def _median(column, condition):
+    # percentile_cont ignores NULLs, so ordering by a CASE expression restricts
+    # the aggregate to the rows matching `condition` within the same pass.
+    return func.percentile_cont(0.5).within_group(case((condition, column)).asc())
+
+
+def _aggregate_columns():
+    """Time-independent per-firm aggregates; these are what `firm_stats` stores."""
+    screener_reached = or_(
+        A.stage.in_(SUCCESS_STAGES),
+        and_(A.stage == "Rejection", or_(A.screener_to_response.isnot(None), A.callback_to_response.isnot(None)))
+    )
+    callback_reached = or_(
+        A.stage.in_(["Callback Invite", "Offer"]),
+        and_(A.stage == "Rejection", A.callback_to_response.isnot(None))
+    )
+
+    return [
+        func.count(A.user_id.distinct()).label("total_users_for_firm"),
+        _count().label("total_applications"),
+        _count(A.stage == "Offer").label("successful_applications"),
+        _count(screener_reached).label("applications_with_screener"),
+        _count(callback_reached).label("applications_with_callback"),
+        _count(A.stage == "Rejection").label("rejections"),
+        _median(A.applied_to_response, and_(
+            A.applied_to_response.isnot(None),
+            or_(A.screener_to_response.isnot(None), A.callback_to_response.isnot(None), A.stage.in_(SUCCESS_STAGES))
+        )).label("median_applied_success"),
+        _median(A.applied_to_response, and_(
+            A.applied_to_response.isnot(None),
+            A.screener_to_response.is_(None),
+            A.callback_to_response.is_(None),
+            A.stage.in_(["Submitted Application", "Rejection"])
+        )).label("median_applied_not_success"),
+        _median(A.screener_to_response, and_(
+            A.screener_to_response.isnot(None),
+            A.callback_to_response.isnot(None),
+            A.stage.in_(["Callback Invite", "Offer"])
+        )).label("median_screener_success"),
+        _median(A.screener_to_response, and_(
+            A.screener_to_response.isnot(None),
+            A.callback_to_response.is_(None),
+            A.stage.in_(["Screener Invite", "Rejection"])
+        )).label("median_screener_not_success"),
+        _median(A.callback_to_response, and_(
+            A.callback_to_response.isnot(None),
+            A.stage.in_(["Callback Invite", "Offer"])
+        )).label("median_callback_success"),
+        _median(A.callback_to_response, and_(
+            A.callback_to_response.isnot(None),
+            A.stage == "Rejection"
+        )).label("median_callback_not_success"),
+        func.min(A.screener_date).label("screener_start"),
+        func.min(A.callback_date).label("callback_start"),
+        func.min(A.callback_response_date).filter(A.stage == "Offer").label("offer_start"),
+    ]
+
+
+def _recent_columns(since: datetime):
+    """Counts of responses newer than `since`; these depend on the clock so are never stored."""
+    return [
+        _count(A.applied_response_date >= since).label("recent_applied"),
+        _count(A.screener_response_date >= since).label("recent_screener"),
+        _count(A.callback_response_date >= since).label("recent_callback"),
+        _count(or_(
+            A.applied_response_date >= since,
+            A.screener_response_date >= since,
+            A.callback_response_date >= since
+        )).label("recent_any"),
+    ]
+
+
+AGGREGATE_FIELDS = [column.name for column in _aggregate_columns()]
+RECENT_FIELDS = [column.name for column in _recent_columns(datetime.utcnow())]
+
+
+def _firm_filter(firms):
+    return A.firm.in_(list(firms)) if firms is not None else A.firm.isnot(None)
+
+
+def firm_stats_query(firms: Optional[Iterable[str]], since: datetime):
+    """Build one grouped statement computing every per-firm aggregate live from `applications`."""
+    return select(A.firm, *_aggregate_columns(), *_recent_columns(since)).where(_firm_filter(firms)).group_by(A.firm)
+
+
+def precomputed_firm_stats_query(firms: Iterable[str], since: datetime):
+    """Read stored aggregates for `firms`, joined to their live recent-response counts."""
+    recent = select(A.firm, *_recent_columns(since)).where(_firm_filter(firms)).group_by(A.firm).subquery()
+    return select(
+        FS.firm,
+        *[getattr(FS, field) for field in AGGREGATE_FIELDS],
+        *[func.coalesce(recent.c[field], 0).label(field) for field in RECENT_FIELDS],
+    ).outerjoin(recent, recent.c.firm == FS.firm).where(FS.firm.in_(list(firms)))
+
+
+def _one_week_ago():
+    return datetime.utcnow() - timedelta(days=7)
+
+
+@stats_duration.timed('compute')
+async def compute_firm_stats(db: AsyncSession, firms: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    """Compute aggregates live from `applications`; all firms when `firms` is None."""
+    if firms is not None:
+        firms = {firm for firm in firms if firm}
+        if not firms:
+            return {}
+    rows = (await db.execute(firm_stats_query(firms, _one_week_ago()))).mappings().all()
+    return {row["firm"]: dict(row) for row in rows}
+
+
+DATE_FIELDS = ("screener_start", "callback_start", "offer_start")
+
+
+def _dumps_row(row):
+    return json.dumps(row, default=lambda value: value.isoformat())
+
+
+def _loads_row(raw):
+    row = json.loads(raw)
+    for field in DATE_FIELDS:
+        if row.get(field):
+            row[field] = date.fromisoformat(row[field])
+    return row
+
+
+firm_stats_cache = create_cache(settings.stats_cache_size, settings.stats_cache_ttl, settings.redis_url,
+                                prefix="firm_stats:", dumps=_dumps_row, loads=_loads_row)
+
+
+@stats_duration.timed('fetch')
+async def fetch_firm_stats(db: AsyncSession, firms: Iterable[str]) -> Dict[str, dict]:
+    """Return one row dict per firm from the cache, then `firm_stats`, then a live fallback."""
+    firms = {firm for firm in firms if firm}
+    if not firms:
+        return {}
+    firm_stats = await firm_stats_cache.get_many(firms)
+
+    pending = firms - firm_stats.keys()
+    if pending:
+        rows = (await db.execute(precomputed_firm_stats_query(pending, _one_week_ago()))).mappings().all()
+        loaded = {row["firm"]: dict(row) for row in rows}
+        missing = pending - loaded.keys()
+        if missing:
+            loaded.update(await compute_firm_stats(db, missing))
+        await firm_stats_cache.set_many(loaded)
+        firm_stats.update(loaded)
+    return firm_stats
+
+
+async def invalidate_firm_stats(firms: Iterable[str]):
+    """Drop cached rows for `firms`; call after the transaction that changed them commits."""
+    await firm_stats_cache.delete_many({firm for firm in firms if firm})
+
+
+def _upsert_from_applications(firms):
+    source = select(A.firm, *_aggregate_columns()).where(_firm_filter(firms)).group_by(A.firm)
+    statement = insert(FS).from_select(["firm", *AGGREGATE_FIELDS], source)
+    return statement.on_conflict_do_update(
+        index_elements=[FS.firm],
+        set_={
+            **{field: statement.excluded[field] for field in AGGREGATE_FIELDS},
+            "refreshed_at": func.timezone('UTC', func.now())
+        }
+    )
+
+
+@stats_duration.timed('refresh')
+async def refresh_firm_stats(db: AsyncSession, firms: Iterable[str]):
+    """Recompute the stored rows for `firms` in the caller's transaction.
+
+    Call after the application changes are flushed and before commit. A per-firm
+    advisory lock serializes concurrent refreshes so a later writer always
+    recomputes from a snapshot that includes the earlier writer's change.
+    """
+    firms = {firm for firm in firms if firm}
+    if not firms:
+        return
+    for firm in sorted(firms):
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(firm))))
+    await db.execute(delete(FS).where(
+        FS.firm.in_(list(firms)),
+        ~select(A.application_id).where(A.firm == FS.firm).exists()
+    ))
+    await db.execute(_upsert_from_applications(firms))
+
+
+@stats_duration.timed('rebuild')
+async def rebuild_firm_stats(db: AsyncSession) -> int:
+    """Recompute every stored row from scratch and return how many firms were written."""
+    await db.execute(delete(FS))
+    await db.execute(_upsert_from_applications(None))
+    await db.commit()
+    return await db.scalar(select(func.count()).select_from(FS))
+
+
+def _values_differ(stored, live):
+    if isinstance(stored, float) or isinstance(live, float):
+        return stored is None or live is None or abs(stored - live) > 1e-6
+    return stored != live
+
+
+async def check_firm_stats(db: AsyncSession) -> List[dict]:
+    """Compare `firm_stats` against the live computation and return every mismatch."""
+    live = await compute_firm_stats(db)
+    stored = {row.firm: row for row in (await db.scalars(select(FS))).all()}
+    mismatches = []
+    for firm in sorted(live.keys() | stored.keys()):
+        if firm not in stored:
+            mismatches.append({"firm": firm, "field": None, "stored": None, "live": "missing row"})
+            continue
+        if firm not in live:
+            mismatches.append({"firm": firm, "field": None, "stored": "orphan row", "live": None})
+            continue
+        for field in AGGREGATE_FIELDS:
+            stored_value, live_value = getattr(stored[firm], field), live[firm][field]
+            if stored_value is None and live_value is None:
+                continue
+            if _values_differ(stored_value, live_value):
+                mismatches.append({"firm": firm, "field": field, "stored": stored_value, "live": live_value})
+    return mismatches
+
+
+def normalize_median(value):
+    """Medians default to 1 when there is no data or the median is 0."""
+    return float(value) if value else 1.0
+
+
+def _rate(numerator, denominator):
+    return {
+        "rate": round((numerator / denominator) * 100, 1) if denominator > 0 else 0.0,
+        "numerator": numerator,
+        "denominator": denominator
+    }
+
+
+def empty_summary_stats(current_stage="Firm not specified"):
+    return {
+        "total_users_for_firm": 0,
+        "total_applications": 0,
+        "successful_applications": 0,
+        "success_rate": 0.0,
+        "median_responses": {
+            "median_applied_to_response": {"success": 0.0, "not_success": 1.0},
+            "median_screener_to_response": {"success": 0.0, "not_success": 1.0},
+            "median_callback_to_response": {"success": 0.0, "not_success": 1.0},
+        },
+        "recent_responses_at_current_stage": 0,
+        "current_stage": current_stage,
+        "success_rate_granular": {
+            "application_to_screener_rate": _rate(0, 0),
+            "screener_to_callback_rate": _rate(0, 0),
+            "callback_to_offer_rate": _rate(0, 0)
+        },
+        "start_dates": {
+            "screener_start": None,
+            "callback_start": None,
+            "offer_start": None
+        }
+    }
+
+
+def build_summary_stats(application, firm_row) -> dict:
+    """Shape a firm aggregate row into the `summary_stats` payload for one application.
+
+    Values already have the types `schemas.SummaryStats` declares (rates and
+    medians are floats), so the payload is encoded as-is, without revalidation.
+    """
+    if not application.firm:
+        return empty_summary_stats()
+    if not firm_row:
+        return empty_summary_stats(application.stage or DEFAULT_STAGE)
+
+    total_applications = firm_row["total_applications"]
+    successful_applications = firm_row["successful_applications"]
+    with_screener = firm_row["applications_with_screener"]
+    with_callback = firm_row["applications_with_callback"]
+    recent_counter = RECENT_COUNTER_BY_STAGE.get(application.stage)
+
+    return {
+        "total_users_for_firm": firm_row["total_users_for_firm"],
+        "total_applications": total_applications,
+        "successful_applications": successful_applications,
+        "success_rate": round((successful_applications / total_applications) * 100, 1) if total_applications > 0 else 0.0,
+        "recent_responses_at_current_stage": firm_row[recent_counter] if recent_counter else 0,
+        "median_responses": {
+            "median_applied_to_response": {
+                "success": normalize_median(firm_row["median_applied_success"]),
+                "not_success": normalize_median(firm_row["median_applied_not_success"])
+            },
+            "median_screener_to_response": {
+                "success": normalize_median(firm_row["median_screener_success"]),
+                "not_success": normalize_median(firm_row["median_screener_not_success"])
+            },
+            "median_callback_to_response": {
+                "success": normalize_median(firm_row["median_callback_success"]),
+                "not_success": normalize_median(firm_row["median_callback_not_success"])
+            },
+        },
+        "current_stage": application.stage or DEFAULT_STAGE,
+        "success_rate_granular": {
+            "application_to_screener_rate": _rate(with_screener, total_applications),
+            "screener_to_callback_rate": _rate(with_callback, with_screener),
+            "callback_to_offer_rate": _rate(successful_applications, with_callback)
+        },
+        "start_dates": {
+            "screener_start": firm_row["screener_start"],
+            "callback_start": firm_row["callback_start"],
+            "offer_start": firm_row["offer_start"]
+        }
+    }
+
+
+async def _main(command):
+    from .database import SessionLocal
+
+    async with SessionLocal() as db:
+        if command == "rebuild":
+            print(f"Rebuilt firm_stats for {await rebuild_firm_stats(db)} firms")
+            return 0
+        mismatches = await check_firm_stats(db)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} mismatches")
+        return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintain the precomputed firm_stats table.")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args.command)))
@@ -1,32 +1,36 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import bcrypt
-import httpx
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from .config import settings
 from . import models
 
-BASE_URL = f'{settings.url}:{settings.port}'
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop.
+# The pool size caps how many hashes run at once; extra logins queue instead of starving other requests.
+password_executor = ThreadPoolExecutor(max_workers=settings.bcrypt_workers, thread_name_prefix='bcrypt')
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
-def get_user_by_email(email: str, db: Session) -> models.User:
-    return db.query(models.User).filter(models.User.email == email).first()
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode('utf-8')
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
-async def send_http_request(endpoint: str, method: str, data: dict = None, token: str = None):
-    url = f"{BASE_URL}{endpoint}"  # Construct the full URL
-    headers = {}
-    if token:
-        headers['Authorization'] = f'Bearer {token}'
-    async with httpx.AsyncClient() as client:
-        if method.upper() == 'POST':
-            response = await client.post(url, json=data, headers=headers)
-        elif method.upper() == 'PUT':
-            response = await client.put(url, json=data, headers=headers)
-        elif method.upper() == 'GET':
-            response = await client.get(url, headers=headers)
-        else:
-            raise ValueError(f"Unsupported HTTP method: {method}")
-        return response
\ No newline at end of file
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(password_executor, _hash_password, password)
+
+async def get_user_by_email(email: str, db: AsyncSession) -> models.User:
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.get_running_loop().run_in_executor(password_executor, _verify_password, plain_password, hashed_password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when the hash was made with a different cost factor than `bcrypt_rounds`."""
+    try:
+        return int(hashed_password.split('$')[2]) != settings.bcrypt_rounds
+    except (IndexError, ValueError):
+        return True
@@ -0,0 +1,105 @@
+"""Debounced, coalesced write-behind for a single record.
+
+The DataGrid fires an update for every cell or calendar change. Rather than
+writing each one straight away, edits are merged into a pending dict and
+written together once the user pauses (or `max_delay` after the first
+unwritten edit, so constant typing still gets saved). Writes for one buffer
+are serialized, and later edits overwrite earlier values for the same field,
+so the stored row always ends up matching the newest edit. `on_settled` only
+sees the result of the write that carried the newest edit; responses
+overtaken by further typing are dropped.
+
+A write that raises puts its fields back under any newer edits and is retried
+with exponential backoff, up to `retries` times in a row; only then are the
+fields dropped (and logged).
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(self,
+                 write: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 on_settled: Optional[Callable[[Any], Awaitable[None]]] = None,
+                 delay: Optional[float] = None,
+                 max_delay: Optional[float] = None,
+                 retries: Optional[int] = None):
+        self.write = write
+        self.on_settled = on_settled
+        self.delay = settings.grid_write_delay if delay is None else delay
+        self.max_delay = settings.grid_write_max_delay if max_delay is None else max_delay
+        self.retries = settings.grid_write_retries if retries is None else retries
+        self.pending: Dict[str, Any] = {}
+        self.submitted = 0  # sequence number of the newest edit
+        self.written = 0    # sequence number of the newest edit that reached the database
+        self.failures = 0   # consecutive failed writes
+        self._first_pending_at: Optional[float] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, fields: Dict[str, Any]) -> int:
+        """Queue `fields` for the next write and (re)start the debounce timer."""
+        self.submitted += 1
+        self.pending.update(fields)
+
+        now = asyncio.get_running_loop().time()
+        if self._first_pending_at is None:
+            self._first_pending_at = now
+        self._schedule(max(0.0, min(self.delay, self._first_pending_at + self.max_delay - now)))
+        return self.submitted
+
+    def _schedule(self, delay: float):
+        if self._timer:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Write everything pending now. Safe to call at any time, e.g. when the page closes."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        async with self._lock:
+            if not self.pending:
+                return
+            fields, sequence = self.pending, self.submitted
+            self.pending, self._first_pending_at = {}, None
+
+            try:
+                result = await self.write(fields)
+            except Exception:
+                self.failures += 1
+                if self.failures > self.retries:
+                    logger.exception("Write-behind flush failed %d times, dropping fields %s",
+                                     self.failures, sorted(fields))
+                    self.failures = 0
+                    return
+                logger.warning("Write-behind flush failed for fields %s, retrying", sorted(fields), exc_info=True)
+                # Edits made during the failed write are newer, so they win
+                self.pending = {**fields, **self.pending}
+                if self._first_pending_at is None:
+                    self._first_pending_at = asyncio.get_running_loop().time()
+                self._schedule(self.delay * 2 ** (self.failures - 1))
+                return
+            self.failures = 0
+            self.written = sequence
+
+        # Edits that arrived during the write will trigger their own flush; only the newest result is shown
+        if self.on_settled and sequence == self.submitted and result is not None:
+            await self.on_settled(result)
+
+    @property
+    def settled(self) -> bool:
+        return self.written == self.submitted
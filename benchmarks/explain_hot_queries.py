@@ -0,0 +1,97 @@
+"""Fail if any hot query plans a sequential scan over the application tables,
+or stops using the index it is meant to use.
+
+The statements come from the same builders the services execute, so the
+check follows the real SQL. Sequential scans are disabled for the session, so
+the planner only falls back to one when no usable index exists; small
+development tables therefore give the same verdict as production-sized ones.
+
+    python -m benchmarks.explain_hot_queries
+
+tests/test_query_plans.py runs the same check under pytest.
+"""
+from datetime import datetime
+import asyncio
+import json
+import sys
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app import models, services, stats
+from app.config import settings
+from app.database import SessionLocal
+
+WATCHED_TABLES = {"applications", "firm_stats"}
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def hot_queries():
+    """name -> (statement, indexes its plan must use)."""
+    since = stats._one_week_ago()
+    firms = ["Kirkland & Ellis", "Latham & Watkins"]
+    user_id = uuid.uuid4()
+    cursor = services.encode_cursor(models.Application(last_updated=datetime.utcnow(), application_id=1))
+    page_size = settings.applications_page_size + 1
+    return {
+        "live firm stats": (stats.firm_stats_query(firms, since), {"ix_applications_firm_stage"}),
+        "precomputed firm stats": (stats.precomputed_firm_stats_query(firms, since),
+                                   {"ix_applications_firm_stage", "firm_stats_pkey"}),
+        "applications page": (services.applications_page_query(user_id, page_size),
+                              {"ix_applications_user_last_updated"}),
+        "applications page after cursor": (services.applications_page_query(user_id, page_size, cursor),
+                                           {"ix_applications_user_last_updated"}),
+    }
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def plan_problems(plan, indexes):
+    """Sequential scans of watched tables, and expected `indexes` the plan does not use."""
+    nodes = list(plan_nodes(plan))
+    problems = [f"seq scan on {node['Relation Name']}" for node in nodes
+                if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in WATCHED_TABLES]
+    used = {node["Index Name"] for node in nodes if "Index Name" in node}
+    problems += [f"does not use {index}" for index in sorted(indexes - used)]
+    return problems
+
+
+async def planned_problems(db, statement, indexes):
+    """plan_problems for `statement`, with sequential scans disabled for `db`'s session."""
+    await db.execute(text("SET enable_seqscan = off"))
+    plan = await db.scalar(Explain(statement))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan_problems(plan[0]["Plan"], indexes)
+
+
+async def main():
+    failures = 0
+    async with SessionLocal() as db:
+        for name, (statement, indexes) in hot_queries().items():
+            problems = await planned_problems(db, statement, indexes)
+            status = f"FAIL {'; '.join(problems)}" if problems else "ok"
+            failures += bool(problems)
+            print(f"{name}: {status}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
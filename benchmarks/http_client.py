@@ -0,0 +1,93 @@
+"""Compare a new httpx.AsyncClient per call against the shared pooled client.
+
+Starts a throwaway uvicorn server on localhost and sends the same number of
+sequential and concurrent GETs both ways.
+
+    python -m benchmarks.http_client --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from app import http_client
+
+
+async def ok_app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def start_server(port):
+    server = uvicorn.Server(uvicorn.Config(ok_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+
+async def per_call(url):
+    async with httpx.AsyncClient() as client:
+        return await client.get(url)
+
+
+async def pooled(url):
+    return await http_client.request("GET", url)
+
+
+async def measure(send, url, total, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(url)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests_per_second": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+    }
+
+
+async def run(total, concurrency, port):
+    url = f"http://127.0.0.1:{port}/"
+    await http_client.start()
+    results = []
+    try:
+        for level in sorted({1, concurrency}):
+            for name, send in (("per_call_client", per_call), ("pooled_client", pooled)):
+                results.append({"client": name, "concurrency": level, **await measure(send, url, total, level)})
+    finally:
+        await http_client.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server, thread = start_server(args.port)
+    try:
+        print(json.dumps(asyncio.run(run(args.requests, args.concurrency, args.port)), indent=2))
+    finally:
+        server.should_exit = True
+        thread.join()
@@ -0,0 +1,101 @@
+"""Compare the old random-ID probe loop with database-allocated IDs under concurrent inserts.
+
+Each worker opens its own session and inserts `--per-worker` applications, one
+committed transaction per insert, for a throwaway user that is deleted (with
+its applications) afterwards. Firm stats refreshes are left out so only ID
+allocation and the insert itself are measured.
+
+    python -m benchmarks.id_allocation --workers 1 8 32 --per-worker 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, event, insert
+
+from app import models
+from app.database import SessionLocal, engine
+
+
+async def random_probe(db, user_id):
+    """What services.create_application did before: guess, SELECT to check, retry, then INSERT."""
+    application_id = random.randint(100000000, 2147483647)
+    while await db.get(models.Application, application_id) is not None:
+        application_id = random.randint(100000000, 2147483647)
+    application = models.Application(application_id=application_id, user_id=user_id, stage="Not Submitted")
+    db.add(application)
+    await db.flush()
+    await db.commit()
+    return application.application_id
+
+
+async def database_allocated(db, user_id):
+    application = await db.scalar(
+        insert(models.Application).values(user_id=user_id, stage="Not Submitted").returning(models.Application)
+    )
+    await db.commit()
+    return application.application_id
+
+
+async def run_mode(allocate, user_id, workers, per_worker):
+    latencies, ids = [], []
+
+    async def worker():
+        async with SessionLocal() as db:
+            for _ in range(per_worker):
+                start = time.perf_counter()
+                ids.append(await allocate(db, user_id))
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(workers)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "inserts_per_second": round(len(ids) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+        "duplicate_ids": len(ids) - len(set(ids)),
+    }
+
+
+async def run(worker_counts, per_worker):
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    user_id = uuid.uuid4()
+    async with SessionLocal() as db:
+        db.add(models.User(user_id=user_id, email=f"id-bench-{user_id}@example.edu"))
+        await db.commit()
+
+    results = []
+    try:
+        for workers in worker_counts:
+            for mode, allocate in (("random_probe", random_probe), ("database_allocated", database_allocated)):
+                statements.clear()
+                result = await run_mode(allocate, user_id, workers, per_worker)
+                inserts = workers * per_worker
+                results.append({"mode": mode, "workers": workers, "inserts": inserts,
+                                "statements_per_insert": round(len(statements) / inserts, 2), **result})
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+        async with SessionLocal() as db:
+            await db.execute(delete(models.User).where(models.User.user_id == user_id))
+            await db.commit()
+        await engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--per-worker", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.workers, args.per_worker)), indent=2))
@@ -0,0 +1,171 @@
+"""Latency and queries per request for the hot endpoints, against seeded data.
+
+Run benchmarks.seed first. Logs in as `--concurrency` seeded users and drives
+the app in-process through httpx's ASGI transport, one endpoint at a time:
+`--requests` requests per endpoint, spread over the users, after
+`--warmup` untimed ones. Queries per request come from the X-DB-Queries
+header. PUT /applications/{id} rewrites applied_to_response on seeded rows.
+
+Results are printed as JSON and, with `--output`, saved. Pass an earlier
+output as `--baseline` to see the change per metric; the exit status is 1
+if any p95 or query count got worse by more than `--tolerance`.
+
+    python -m benchmarks.load --output before.json
+    python -m benchmarks.load --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+import httpx
+from sqlalchemy import select
+
+from app import models
+from app.database import SessionLocal
+from app.main import app
+
+from .seed import PASSWORD
+
+# name -> (method, path template, whether the request needs one of the user's application ids)
+ENDPOINTS = {
+    "GET /applications/me": ("GET", "/applications/me", False),
+    "GET /applications/me/{id}": ("GET", "/applications/me/{id}", True),
+    "PUT /applications/{id}": ("PUT", "/applications/{id}", True),
+    "GET /applications/total": ("GET", "/applications/total", False),
+}
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "queries_per_request")
+GATED = ("p95_ms", "queries_per_request")
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+
+class Session:
+    def __init__(self, email, headers, application_ids):
+        self.email = email
+        self.headers = headers
+        self.application_ids = application_ids
+
+
+async def log_in(client, emails, password):
+    async def one(email):
+        response = await client.post("/login", data={"username": email, "password": password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        applications = (await client.get("/applications/me", headers=headers)).json()
+        return Session(email, headers, [item["application"]["application_id"] for item in applications])
+
+    return await asyncio.gather(*[one(email) for email in emails])
+
+
+async def run_endpoint(client, sessions, name, requests, warmup, rng):
+    method, template, needs_id = ENDPOINTS[name]
+    latencies, queries, errors = [], [], 0
+
+    async def send(session, record):
+        nonlocal errors
+        application_id = rng.choice(session.application_ids) if needs_id else None
+        body = {"applied_to_response": rng.randint(1, 30)} if method == "PUT" else None
+        start = time.perf_counter()
+        response = await client.request(method, template.format(id=application_id), headers=session.headers, json=body)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not record:
+            return
+        if response.status_code >= 400:
+            errors += 1
+            return
+        latencies.append(elapsed)
+        queries.append(int(response.headers.get("x-db-queries", 0)))
+
+    async def worker(session, count, record):
+        for _ in range(count):
+            await send(session, record)
+
+    for count, record in ((warmup, False), (requests, True)):
+        # Split `count` requests over the sessions, one concurrent worker each
+        shares = [count // len(sessions) + (i < count % len(sessions)) for i in range(len(sessions))]
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(session, share, record) for session, share in zip(sessions, shares)])
+        seconds = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "queries_per_request": round(statistics.mean(queries), 2) if queries else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Attach the change against `baseline` to each endpoint and return the regressions beyond `tolerance`."""
+    regressions = []
+    for name, current in results["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        current["change"] = {}
+        for metric in COMPARED:
+            if not before.get(metric) or current.get(metric) is None:
+                continue
+            change = (current[metric] - before[metric]) / before[metric]
+            current["change"][metric] = {"baseline": before[metric], "change_pct": round(change * 100, 1)}
+            if metric in GATED and change > tolerance:
+                regressions.append(f"{name} {metric}: {before[metric]} -> {current[metric]}")
+    return regressions
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    async with SessionLocal() as db:
+        emails = (await db.scalars(
+            select(models.User.email).where(models.User.email.like(f"{args.prefix}-%@example.edu"))
+            .order_by(models.User.email).limit(args.concurrency)
+        )).all()
+    if not emails:
+        raise SystemExit(f"No seeded users with prefix '{args.prefix}'; run python -m benchmarks.seed first")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        sessions = await log_in(client, emails, args.password)
+        endpoints = {}
+        for name in args.endpoints:
+            endpoints[name] = await run_endpoint(client, sessions, name, args.requests, args.warmup, rng)
+
+    return {"concurrency": len(sessions), "requests_per_endpoint": args.requests,
+            "applications_per_user": round(statistics.mean(len(s.application_ids) for s in sessions), 1),
+            "endpoints": endpoints}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients, each a different seeded user")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per endpoint")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--prefix", default="seed", help="email prefix the seeded users were created with")
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="save the results here")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p95/queries regression, as a fraction")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,96 @@
+"""Login throughput, and latency of other endpoints while logins are in flight.
+
+Creates a throwaway user and drives the app in-process through httpx's ASGI
+transport. Each run keeps `--logins` concurrent login loops busy for
+`--seconds` while a probe loop hits a cheap endpoint. The run is done once
+with bcrypt on the worker pool, and once with bcrypt inline on the event
+loop (the old behaviour) for comparison. The user is deleted afterwards.
+
+    python -m benchmarks.login_load --logins 8 --seconds 5
+"""
+import argparse
+import asyncio
+from concurrent.futures import Executor, Future
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+from app import utils
+from app.main import app
+
+PROBE_PATH = "/reference/search?kind=firm&q=lat"
+PROBE_INTERVAL = 0.005
+
+
+class InlineExecutor(Executor):
+    """Runs submitted work immediately on the calling thread, i.e. blocks the event loop."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+
+async def run(client, email, password, logins, seconds):
+    deadline = time.perf_counter() + seconds
+    login_latencies, probe_latencies = [], []
+
+    async def login_loop():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.post("/login", data={"username": email, "password": password})
+            response.raise_for_status()
+            login_latencies.append((time.perf_counter() - start) * 1000)
+
+    async def probe_loop():
+        # Timed from just before a short sleep, so time spent waiting for a blocked loop counts too
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            (await client.get(PROBE_PATH)).raise_for_status()
+            probe_latencies.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+    await asyncio.gather(probe_loop(), *[login_loop() for _ in range(logins)])
+    return {
+        "logins_per_second": round(len(login_latencies) / seconds, 1),
+        "login_p50_ms": round(statistics.median(login_latencies), 1),
+        "probe_requests": len(probe_latencies),
+        "probe_p50_ms": round(statistics.median(probe_latencies), 2),
+        "probe_p99_ms": round(percentile(probe_latencies, 0.99), 2),
+    }
+
+
+async def main(logins, seconds):
+    email, password = f"login-bench-{uuid.uuid4().hex[:8]}@example.com", "benchmark-password"
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        (await client.post("/users/create", json={"email": email, "password": password})).raise_for_status()
+        token = (await client.post("/login", data={"username": email, "password": password})).json()["access_token"]
+
+        pool = utils.password_executor
+        results = {}
+        try:
+            for mode, executor in (("worker_pool", pool), ("inline", InlineExecutor())):
+                utils.password_executor = executor
+                results[mode] = await run(client, email, password, logins, seconds)
+        finally:
+            utils.password_executor = pool
+            await client.delete("/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    return {"bcrypt_rounds": utils.settings.bcrypt_rounds, "bcrypt_workers": utils.settings.bcrypt_workers,
+            "concurrent_logins": logins, **results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.logins, args.seconds)), indent=2))
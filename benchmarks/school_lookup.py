@@ -0,0 +1,61 @@
+"""Compare the old DataFrame substring scan with the domain-suffix index for SSO school matching.
+
+    python -m benchmarks.school_lookup --iterations 2000
+"""
+import argparse
+import json
+import time
+
+import pandas as pd
+
+from app import loader
+
+SAMPLE_EMAILS = [
+    "student@yale.edu",
+    "jd24@law.harvard.edu",
+    "alice@alumni.stanford.edu",
+    "bob@mail.law.columbia.edu",
+    "carol@notyale.edu",
+    "dave@gmail.com",
+]
+
+
+def linear_scan(law_schools_df, email):
+    """The matching the Google callback used to do on every login."""
+    domain_parts = email.split('@')[-1].split('.')
+    if 'edu' in domain_parts:
+        domain_index = domain_parts.index('edu')
+        matched_domain = '.'.join(domain_parts[domain_index - 1:])
+    else:
+        matched_domain = 'NOT FOUND'
+    matched = law_schools_df.loc[law_schools_df['Domain'].str.contains(matched_domain, case=False, na=False), 'School'].values
+    return matched[0] if len(matched) else None
+
+
+def suffix_index(email):
+    school = loader.find_law_school(email)
+    return school.name if school else None
+
+
+def time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for email in SAMPLE_EMAILS:
+            fn(email)
+    return (time.perf_counter() - start) / (iterations * len(SAMPLE_EMAILS)) * 1e6
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    law_schools_df = pd.read_csv(loader.law_schools.file_path)[['School', 'Domain']].sort_values(by='School').reset_index(drop=True)
+    loader.preload()
+
+    print(json.dumps({
+        "matches": {email: {"linear_scan": linear_scan(law_schools_df, email), "suffix_index": suffix_index(email)}
+                    for email in SAMPLE_EMAILS},
+        "linear_scan_us": round(time_per_call(lambda email: linear_scan(law_schools_df, email), max(1, args.iterations // 20)), 3),
+        "suffix_index_us": round(time_per_call(suffix_index, args.iterations), 3),
+    }, indent=2))
@@ -0,0 +1,155 @@
+"""Fill the database with synthetic users, profiles and applications.
+
+Users get a profile (school, rank, circumstances) and `--applications`
+applications each, spread over the firms and cities in src/ with a long
+tail, as real traffic is. Each application has a stage, and dates consistent
+with it within the `--days` before `--until`. The same `--seed` produces the
+same data. Every seeded user shares one password (`--password`, hashed once) so
+benchmarks.load can log in as them. Firm stats and the global counters are
+rebuilt afterwards.
+
+    python -m benchmarks.seed --users 1000 --applications 25
+    python -m benchmarks.seed --purge
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+import json
+import random
+import time
+import uuid
+
+from sqlalchemy import delete, insert, text
+
+from app import counters, models, stats
+from app.database import SessionLocal
+from app.loader import load_cities, load_law_firms, load_law_schools
+from app.utils import hash_password
+
+PASSWORD = "seed-password"
+# The schemas only accept 2024 dates, so the season ends there rather than today
+SEASON_END = date(2024, 12, 31)
+BATCH_SIZE = 1000
+
+STAGE_WEIGHTS = {
+    "Not Submitted": 0.08,
+    "Submitted Application": 0.37,
+    "Screener Invite": 0.15,
+    "Callback Invite": 0.10,
+    "Offer": 0.06,
+    "Rejection": 0.24,
+}
+# How many responses (applied, screener, callback) an application at each stage has received
+RESPONSES_BY_STAGE = {"Not Submitted": 0, "Submitted Application": 0, "Screener Invite": 1, "Callback Invite": 2, "Offer": 3}
+CIRCUMSTANCES = ["Disabled", "First Generation", "International", "Parent", "Under-Represented Minority", "Veteran"]
+NETWORKED = ["Junior", "Senior", "Reception"]
+
+
+def email(prefix: str, number: int) -> str:
+    return f"{prefix}-{number:06d}@example.edu"
+
+
+def long_tail(values, exponent=0.9):
+    """Weights that favour the start of `values` (the CSVs list the biggest firms and cities first)."""
+    return [1 / (rank + 1) ** exponent for rank in range(len(values))]
+
+
+def application(rng: random.Random, user_id, firm, city, today: date, days: int) -> dict:
+    """One application row; `today` is the last date any of its dates may fall on."""
+    stage = rng.choices(list(STAGE_WEIGHTS), weights=list(STAGE_WEIGHTS.values()))[0]
+    row = {"user_id": user_id, "firm": firm, "city": city, "stage": stage, "networked": None,
+           "applied_date": None, "applied_response_date": None, "applied_to_response": None,
+           "screener_date": None, "screener_response_date": None, "screener_to_response": None,
+           "callback_date": None, "callback_response_date": None, "callback_to_response": None}
+    if rng.random() < 0.3:
+        row["networked"] = rng.sample(NETWORKED, rng.randint(1, len(NETWORKED)))
+    if stage == "Not Submitted":
+        return row
+
+    # A rejection can arrive at any step; the other stages imply how far the application got
+    responses = rng.randint(1, 3) if stage == "Rejection" else RESPONSES_BY_STAGE[stage]
+    sent = today - timedelta(days=rng.randint(0, days))
+    for step in ("applied", "screener", "callback")[:responses + 1]:
+        row["applied_date" if step == "applied" else f"{step}_date"] = sent
+        if responses == 0:
+            break
+        waited = min(int(rng.lognormvariate(2.3, 0.6)), (today - sent).days)
+        row[f"{step}_response_date"] = sent + timedelta(days=waited)
+        row[f"{step}_to_response"] = waited
+        responses -= 1
+        sent = row[f"{step}_response_date"] + timedelta(days=min(rng.randint(1, 10), (today - row[f"{step}_response_date"]).days))
+    return row
+
+
+async def purge(db, prefix: str) -> int:
+    # Profiles and applications go with the users (ON DELETE CASCADE)
+    result = await db.execute(delete(models.User).where(models.User.email.like(f"{prefix}-%@example.edu")))
+    await db.commit()
+    return result.rowcount
+
+
+async def seed(users: int, applications: int, prefix: str, password: str, days: int, until: date, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    firms, cities, schools = load_law_firms(), load_cities(), load_law_schools()
+    firm_weights, city_weights = long_tail(firms), long_tail(cities)
+    applications = min(applications, len(firms) * len(cities))
+    hashed = await hash_password(password)
+
+    start = time.perf_counter()
+    created = 0
+    async with SessionLocal() as db:
+        await purge(db, prefix)
+        for first in range(0, users, BATCH_SIZE):
+            user_rows, profile_rows, application_rows = [], [], []
+            for number in range(first, min(first + BATCH_SIZE, users)):
+                user_id = uuid.UUID(int=rng.getrandbits(128), version=4)
+                user_rows.append({"user_id": user_id, "email": email(prefix, number), "password": hashed, "is_active": True})
+                profile_rows.append({
+                    "user_id": user_id,
+                    "school": rng.choice(schools).name if schools else None,
+                    "rank": rng.choice([None, 5, 10, 15, 25, 33, 50, 75]),
+                    "circumstances": rng.sample(CIRCUMSTANCES, rng.choice([0, 0, 0, 1, 1, 2])) or None,
+                })
+                pairs = set()
+                while len(pairs) < applications:
+                    pairs.add((rng.choices(firms, firm_weights)[0], rng.choices(cities, city_weights)[0]))
+                application_rows.extend(application(rng, user_id, firm, city, until, days) for firm, city in sorted(pairs))
+
+            await db.execute(insert(models.User), user_rows)
+            await db.execute(insert(models.Profile), profile_rows)
+            for offset in range(0, len(application_rows), BATCH_SIZE):
+                await db.execute(insert(models.Application), application_rows[offset:offset + BATCH_SIZE])
+            await db.commit()
+            created += len(application_rows)
+
+        firms_written = await stats.rebuild_firm_stats(db)
+        await counters.reconcile(db)
+        await db.execute(text("ANALYZE applications"))
+        await db.commit()
+
+    return {"users": users, "applications": created, "firm_stats_rows": firms_written,
+            "seconds": round(time.perf_counter() - start, 1)}
+
+
+async def main(args):
+    if args.purge:
+        async with SessionLocal() as db:
+            removed = await purge(db, args.prefix)
+            await stats.rebuild_firm_stats(db)
+            await counters.reconcile(db)
+        return {"purged_users": removed}
+    return await seed(args.users, args.applications, args.prefix, args.password, args.days, args.until, args.seed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--applications", type=int, default=25, help="applications per user")
+    parser.add_argument("--days", type=int, default=120, help="spread application dates over this many days")
+    parser.add_argument("--until", type=date.fromisoformat, default=SEASON_END, help="latest date to generate")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--prefix", default="seed", help="email prefix marking seeded users")
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--purge", action="store_true", help="delete the seeded users instead")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args)), indent=2))
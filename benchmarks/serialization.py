@@ -0,0 +1,99 @@
+"""Time encoding lists of applications with summary stats as JSON.
+
+Compares what GET /applications/me used to do (FastAPI validates the list
+against response_model, runs jsonable_encoder, then json.dumps) with the
+TypeAdapter path (`validate_responses`) and the orjson fast path the routes
+use now. Applications are generated like benchmarks.seed does, without a
+database. Each path's output is checked against the old one.
+
+    python -m benchmarks.serialization --sizes 10 100 1000 --repeat 20
+"""
+import argparse
+import asyncio
+from datetime import date, datetime
+import json
+import random
+import statistics
+import time
+from typing import List
+import uuid
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import models, schemas, serialization, stats
+from app.loader import load_cities, load_law_firms
+
+from .seed import SEASON_END, application
+
+FIRM_ROW = {
+    "total_users_for_firm": 412, "total_applications": 530, "successful_applications": 31,
+    "applications_with_screener": 140, "applications_with_callback": 62, "rejections": 120,
+    "median_applied_success": 9.0, "median_applied_not_success": 21.5, "median_screener_success": 6.0,
+    "median_screener_not_success": 12.0, "median_callback_success": 8.5, "median_callback_not_success": None,
+    "screener_start": date(2024, 8, 5), "callback_start": date(2024, 8, 19), "offer_start": date(2024, 9, 2),
+    "recent_applied": 14, "recent_screener": 6, "recent_callback": 2, "recent_any": 19,
+}
+
+
+def applications_with_stats(count, rng):
+    firms, cities = load_law_firms(), load_cities()
+    user_id = uuid.uuid4()
+    items = []
+    for number in range(count):
+        row = application(rng, user_id, rng.choice(firms), rng.choice(cities), SEASON_END, 120)
+        app_row = models.Application(application_id=rng.randrange(1, 2 ** 30), last_updated=datetime.utcnow(), **row)
+        items.append({"application": app_row, "summary_stats": stats.build_summary_stats(app_row, FIRM_ROW)})
+    return items
+
+
+RESPONSE_FIELD = create_response_field(name="Response", type_=List[schemas.ApplicationResponseWithStats])
+
+
+async def fastapi_response_model(items) -> bytes:
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=items, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def type_adapter(items) -> bytes:
+    adapter = serialization.applications_with_stats_adapter
+    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+
+async def orjson_fast_path(items) -> bytes:
+    return serialization.dumps([serialization.with_stats_payload(item) for item in items])
+
+
+PATHS = {"fastapi_response_model": fastapi_response_model, "type_adapter": type_adapter, "orjson_fast_path": orjson_fast_path}
+
+
+async def run(sizes, repeat):
+    rng = random.Random(1)
+    results = []
+    for size in sizes:
+        items = applications_with_stats(size, rng)
+        expected = json.loads(await fastapi_response_model(items))
+        for path, encode in PATHS.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                body = await encode(items)
+                timings.append((time.perf_counter() - start) * 1000)
+            results.append({
+                "path": path,
+                "applications": size,
+                "median_ms": round(statistics.median(timings), 3),
+                "per_application_us": round(statistics.median(timings) * 1000 / size, 2),
+                "bytes": len(body),
+                "matches_response_model": json.loads(body) == expected,
+            })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.sizes, args.repeat)), indent=2))
@@ -0,0 +1,104 @@
+"""Measure how stats queries and latency scale with applications per user.
+
+Seeds a throwaway user with N applications inside a transaction that is rolled
+back afterwards, then times `calculate_application_stats` over every row, the
+same work `/applications/me` used to do, and `calculate_applications_stats`,
+the batched path the endpoint uses now.
+
+    python -m benchmarks.stats_engine --sizes 1 10 50 100 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models, stats
+from app.database import engine
+from app.loader import load_cities, load_law_firms
+from app.services import calculate_application_stats, calculate_applications_stats
+
+STAGES = ["Not Submitted", "Submitted Application", "Screener Invite", "Callback Invite", "Offer", "Rejection"]
+
+
+async def seed(db, user_id, count, firms, cities):
+    for i in range(count):
+        db.add(models.Application(
+            user_id=user_id,
+            firm=firms[i % len(firms)],
+            city=cities[(i // len(firms)) % len(cities)],
+            stage=random.choice(STAGES),
+            applied_to_response=random.randint(1, 30),
+            screener_to_response=random.choice([None, random.randint(1, 20)]),
+            callback_to_response=random.choice([None, random.randint(1, 20)]),
+        ))
+    await db.flush()
+
+
+async def run(sizes, repeat):
+    firms, cities = load_law_firms(), load_cities()
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    results = []
+    for size in sizes:
+        connection = await engine.connect()
+        transaction = await connection.begin()
+        db = AsyncSession(bind=connection, expire_on_commit=False)
+        try:
+            user = models.User(user_id=uuid.uuid4(), email=f"bench-{uuid.uuid4()}@example.edu")
+            db.add(user)
+            await db.flush()
+            await seed(db, user.user_id, size, firms, cities)
+            applications = (await db.scalars(select(models.Application).where(
+                models.Application.user_id == user.user_id,
+                models.Application.firm.isnot(None)
+            ))).all()
+
+            async def per_application():
+                return [await calculate_application_stats(application, db) for application in applications]
+
+            paths = {
+                "per_application": per_application,
+                "batched": lambda: calculate_applications_stats(applications, db),
+            }
+            for path, compute in paths.items():
+                timings = []
+                for _ in range(repeat):
+                    await stats.firm_stats_cache.clear()
+                    statements.clear()
+                    start = time.perf_counter()
+                    await compute()
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                results.append({
+                    "path": path,
+                    "applications": size,
+                    "queries": len(statements),
+                    "queries_per_application": round(len(statements) / size, 2),
+                    "median_ms": round(statistics.median(timings), 2),
+                    "max_ms": round(max(timings), 2),
+                })
+        finally:
+            await db.close()
+            await transaction.rollback()
+            await connection.close()
+
+    event.remove(engine.sync_engine, "before_cursor_execute", count_statement)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 25, 50, 100])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.sizes, args.repeat)), indent=2))
@@ -0,0 +1,58 @@
+"""Shared fixtures.
+
+Everything under app/ reads its settings (.env or DATABASE_* variables) on
+import, so without them no test is collected. Tests that talk to Postgres take
+the `database` fixture and are skipped when it can't be reached.
+"""
+import pytest
+from pydantic import ValidationError
+
+try:
+    from app.config import settings
+except ValidationError:
+    collect_ignore_glob = ['test_*.py']
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture(scope='session')
+def database_reachable() -> bool:
+    import psycopg
+
+    try:
+        psycopg.connect(host=settings.database_host, port=settings.database_port, dbname=settings.database_name,
+                        user=settings.database_username, password=settings.database_password,
+                        connect_timeout=3).close()
+    except psycopg.OperationalError:
+        return False
+    return True
+
+
+@pytest.fixture
+async def database(database_reachable):
+    if not database_reachable:
+        pytest.skip("database not reachable")
+    from app.database import engine
+
+    yield engine
+    # Each test runs on its own event loop; pooled connections can't outlive it
+    await engine.dispose()
+
+
+@pytest.fixture
+async def user(database):
+    """A fresh user, deleted with its applications afterwards."""
+    import uuid
+
+    from app import schemas, services
+    from app.database import SessionLocal
+
+    async with SessionLocal() as db:
+        created = await services.create_user(db, schemas.UserCreate(email=f"test-{uuid.uuid4().hex[:12]}@example.edu",
+                                                                    password="test-password"))
+    yield created
+    async with SessionLocal() as db:
+        await services.delete_user(db, await db.merge(created))
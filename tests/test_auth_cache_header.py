@@ -0,0 +1,36 @@
+import httpx
+import pytest
+
+from app import oauth2, schemas, services
+from app.database import SessionLocal
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_routes_returning_responses_keep_the_auth_cache_header(user):
+    async with SessionLocal() as db:
+        application = await services.create_application(db, user.user_id, schemas.ApplicationCreate(firm="Header Test LLP"))
+    await oauth2.invalidate_user(user.user_id)
+    headers = {"Authorization": f"Bearer {oauth2.create_access_token(data={'sub': str(user.user_id)})}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/applications/me", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["x-auth-cache"] == "claims"
+
+        response = await client.get("/applications/me", headers=headers, params={"stream": "true"})
+        assert response.headers["x-auth-cache"] == "claims"
+
+        response = await client.get("/applications/me/export", headers=headers)
+        assert response.headers["x-auth-cache"] == "claims"
+
+        response = await client.get(f"/applications/me/{application.application_id}", headers=headers)
+        assert response.headers["x-auth-cache"] == "claims"
+
+        for method, expected in (("PUT", "miss"), ("PATCH", "hit")):
+            response = await client.request(method, f"/applications/{application.application_id}", headers=headers,
+                                            json={"applied_to_response": 4})
+            assert response.status_code == 200
+            assert response.headers["x-auth-cache"] == expected
+            assert response.headers["content-length"] == str(len(response.content))
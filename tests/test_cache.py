@@ -0,0 +1,143 @@
+import fnmatch
+
+import pytest
+
+from app import schemas, services, stats
+from app.cache import LRUCache, RedisCache
+from app.database import SessionLocal
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """The slice of redis.asyncio.Redis that RedisCache uses, over a dict; expiry follows `clock`."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.round_trips = 0
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] <= self.clock():
+            del self.data[key]
+            return None
+        return entry
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [entry[0] if entry else None for entry in map(self._live, keys)]
+
+    async def delete(self, *keys):
+        self.round_trips += 1
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key, value, ex):
+        self.commands.append((key, value, ex))
+        return self
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        for key, value, ex in self.commands:
+            self.redis.data[key] = (value, self.redis.clock() + ex)
+        return [True] * len(self.commands)
+
+
+async def test_lru_is_bounded_and_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    await cache.set('a', 1)
+    await cache.set('b', 2)
+    assert await cache.get('a') == 1  # 'b' is now the least recently used
+    await cache.set('c', 3)
+
+    assert len(cache) == 2
+    assert await cache.get_many(['a', 'b', 'c']) == {'a': 1, 'c': 3}
+    assert cache.evictions == 1
+
+
+async def test_lru_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(ttl=10, clock=clock)
+    await cache.set('a', 1)
+    clock.now = 9.9
+    assert await cache.get('a') == 1
+    clock.now = 10
+    assert await cache.get('a') is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_redis_cache_round_trips_values_and_expires_them():
+    clock = FakeClock()
+    client = FakeRedis(clock)
+    cache = RedisCache(client, ttl=10, prefix='test:')
+    await cache.set_many({'a': {'n': 1}, 'b': [2]})
+    assert set(client.data) == {'test:a', 'test:b'}
+
+    client.round_trips = 0
+    assert await cache.get_many(['a', 'b', 'c']) == {'a': {'n': 1}, 'b': [2]}
+    assert client.round_trips == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    clock.now = 10
+    assert await cache.get('a') is None
+
+
+async def test_redis_cache_delete_and_clear_stay_within_prefix():
+    client = FakeRedis(FakeClock())
+    cache = RedisCache(client, prefix='test:')
+    other = RedisCache(client, prefix='other:')
+    await cache.set_many({'a': 1, 'b': 2})
+    await other.set('a', 3)
+
+    await cache.delete('a')
+    assert await cache.get_many(['a', 'b']) == {'b': 2}
+    await cache.clear()
+    assert await cache.get('b') is None
+    assert await other.get('a') == 3
+    assert 'evictions' not in cache.stats()
+
+
+STALE = {'firm': 'stale'}
+
+
+async def test_firm_stats_are_invalidated_after_create_update_and_delete(user):
+    firm, other_firm = f"Cache Test LLP {user.user_id}", f"Cache Test Other LLP {user.user_id}"
+
+    async with SessionLocal() as db:
+        await stats.firm_stats_cache.set(firm, STALE)
+        application = await services.create_application(db, user.user_id, schemas.ApplicationCreate(firm=firm))
+        assert await stats.firm_stats_cache.get(firm) is None
+
+        # Moving the application to another firm changes the stats of both
+        await stats.firm_stats_cache.set_many({firm: STALE, other_firm: STALE})
+        await services.update_application(db, user.user_id, application.application_id,
+                                          schemas.ApplicationUpdate(firm=other_firm))
+        assert await stats.firm_stats_cache.get(firm) != STALE
+        assert await stats.firm_stats_cache.get(other_firm) != STALE
+
+        await stats.firm_stats_cache.set(other_firm, STALE)
+        assert await services.delete_application(db, application.application_id)
+        assert await stats.firm_stats_cache.get(other_firm) is None
@@ -0,0 +1,29 @@
+import pytest
+
+from app.loader import find_law_school
+
+
+@pytest.mark.parametrize("email", [
+    "law.harvard.edu",
+    "jd24@law.harvard.edu",
+    "someone@HARVARD.edu",
+    "x@mail.law.harvard.edu.",
+])
+def test_subdomains_resolve_to_the_parent_school(email):
+    assert find_law_school(email).domain == "harvard.edu"
+
+
+def test_alumni_domain_resolves_to_the_school():
+    assert find_law_school("alice@alumni.stanford.edu").domain == "stanford.edu"
+
+
+@pytest.mark.parametrize("email", [
+    "carol@notharvard.edu",
+    "harvard.edu.example.com",
+    "dave@gmail.com",
+    "erin@example.edu",
+    "edu",
+    "",
+])
+def test_other_domains_do_not_match(email):
+    assert find_law_school(email) is None
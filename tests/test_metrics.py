@@ -0,0 +1,81 @@
+import re
+
+import httpx
+import pytest
+
+from app.main import app
+from app.metrics import CONTENT_TYPE, requests_in_flight
+
+pytestmark = pytest.mark.anyio
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text):
+    """Exposition text -> ({name: type}, [(name, labels, value)]); fails on any malformed line."""
+    types, samples = {}, []
+    assert text.endswith('\n')
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert kind in ('counter', 'gauge', 'histogram'), line
+            types[name] = kind
+        elif line.startswith('# HELP '):
+            continue
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"malformed sample: {line!r}"
+            name, labels, value = match.groups()
+            float(value)
+            samples.append((name, dict(LABEL.findall(labels or '')), value))
+    return types, samples
+
+
+async def scrape(client):
+    response = await client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == f'{CONTENT_TYPE}; charset=utf-8'
+    return parse(response.text)
+
+
+async def test_metrics_exposition():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        # Unauthenticated, so no database is needed: matched routes answer 401, the rest 404
+        assert (await client.put('/applications/123', json={})).status_code == 401
+        assert (await client.put('/applications/456', json={})).status_code == 401
+        assert (await client.get('/no/such/page')).status_code == 404
+        types, samples = await scrape(client)
+
+    for name, _, _ in samples:
+        base = re.sub(r'_(bucket|sum|count)$', '', name)
+        assert name in types or base in types, f"{name} has no TYPE line"
+
+    durations = [(labels, value) for name, labels, value in samples if name == 'http_request_duration_seconds_count']
+    routes = {labels['route'] for labels, _ in durations}
+    assert '/applications/{application_id}' in routes
+    assert 'unmatched' in routes
+    assert not any(route.startswith('/applications/1') or route.startswith('/applications/4') for route in routes)
+    put_counts = [int(value) for labels, value in durations
+                  if labels['method'] == 'PUT' and labels['route'] == '/applications/{application_id}']
+    assert sum(put_counts) >= 2
+
+    # Buckets are cumulative, end at +Inf and match _count
+    series = {}
+    for name, labels, value in samples:
+        if name == 'http_request_duration_seconds_bucket':
+            key = tuple(sorted((k, v) for k, v in labels.items() if k != 'le'))
+            series.setdefault(key, []).append((labels['le'], int(value)))
+    counts = {tuple(sorted(labels.items())): int(value) for labels, value in durations}
+    assert series
+    for key, buckets in series.items():
+        values = [value for _, value in buckets]
+        assert values == sorted(values)
+        assert buckets[-1][0] == '+Inf'
+        assert buckets[-1][1] == counts[key]
+
+    # Only the scrape itself was in flight while it rendered; once it returned, nothing is
+    in_flight = {labels['method']: float(value) for name, labels, value in samples if name == 'http_requests_in_flight'}
+    assert in_flight.pop('GET') == 1 and in_flight['PUT'] == 0 and not any(in_flight.values())
+    _, samples = parse('\n'.join(requests_in_flight.render()) + '\n')
+    assert not any(float(value) for _, _, value in samples)
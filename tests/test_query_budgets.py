@@ -0,0 +1,54 @@
+"""Statements per request on the hot endpoints must not grow with the number of applications (no N+1)."""
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app import models, oauth2, services, stats
+from app.database import SessionLocal
+from app.main import app
+from app.querycount import query_budget
+
+pytestmark = pytest.mark.anyio
+
+# name -> (method, path, body, budget), measured with empty caches
+ENDPOINTS = {
+    "list": ("GET", "/applications/me", None, 3),
+    "get": ("GET", "/applications/me/{id}", None, 3),
+    "update": ("PUT", "/applications/{id}", {"applied_to_response": 3}, 8),
+    "total": ("GET", "/applications/total", None, 1),
+}
+
+
+async def give_applications(user, count):
+    """Replace the user's applications with `count` new ones, through the services so counters and firm stats stay right."""
+    A = models.Application
+
+    async def rows():
+        for number in range(count):
+            yield number, {"firm": f"Budget Test LLP {number}"}
+
+    async with SessionLocal() as db:
+        for application_id in (await db.scalars(select(A.application_id).where(A.user_id == user.user_id))).all():
+            await services.delete_application(db, application_id)
+        assert (await services.import_applications(db, user.user_id, rows()))["inserted"] == count
+        return (await db.scalars(select(A.application_id).where(A.user_id == user.user_id))).all()
+
+
+async def count_queries(user, name, application_id):
+    method, path, body, budget = ENDPOINTS[name]
+    headers = {"Authorization": f"Bearer {oauth2.create_access_token(data={'sub': str(user.user_id)})}"}
+    await stats.firm_stats_cache.clear()
+    await oauth2.current_user_cache.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        with query_budget(budget) as queries:
+            response = await client.request(method, path.format(id=application_id), headers=headers, json=body)
+    assert response.status_code == 200, response.text
+    assert int(response.headers["x-db-queries"]) == queries.count
+    return queries.count
+
+
+@pytest.mark.parametrize("name", list(ENDPOINTS))
+async def test_queries_do_not_grow_with_applications(user, name):
+    few = await count_queries(user, name, (await give_applications(user, 2))[0])
+    many = await count_queries(user, name, (await give_applications(user, 20))[0])
+    assert many == few
@@ -0,0 +1,13 @@
+import pytest
+
+from app.database import SessionLocal
+from benchmarks.explain_hot_queries import hot_queries, planned_problems
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("name", list(hot_queries()))
+async def test_hot_query_uses_its_index(database, name):
+    statement, indexes = hot_queries()[name]
+    async with SessionLocal() as db:
+        assert await planned_problems(db, statement, indexes) == []
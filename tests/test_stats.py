@@ -0,0 +1,14 @@
+from collections import defaultdict
+from types import SimpleNamespace
+
+import pytest
+
+from app import schemas, stats
+
+
+@pytest.mark.parametrize("firm_row", [None, defaultdict(int, screener_start=None, callback_start=None, offer_start=None)])
+def test_null_stage_still_matches_the_schema(firm_row):
+    application = SimpleNamespace(firm="Stage Test LLP", stage=None)
+    summary = stats.build_summary_stats(application, firm_row)
+    assert summary["current_stage"] == stats.DEFAULT_STAGE
+    schemas.SummaryStats.model_validate(summary)
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from app.writebehind import WriteBehindBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakyWriter:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.writes = []
+
+    async def __call__(self, fields):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database went away")
+        self.writes.append(dict(fields))
+        return fields
+
+
+async def test_edits_are_coalesced():
+    writer = FlakyWriter()
+    buffer = WriteBehindBuffer(writer, delay=0.01, max_delay=1)
+    buffer.submit({'firm': 'A'})
+    buffer.submit({'city': 'Boston', 'firm': 'B'})
+    await asyncio.sleep(0.05)
+    assert writer.writes == [{'firm': 'B', 'city': 'Boston'}]
+    assert buffer.settled
+
+
+async def test_failed_write_keeps_fields_and_retries():
+    writer = FlakyWriter(failures=1)
+    buffer = WriteBehindBuffer(writer, delay=0.01, max_delay=1, retries=2)
+    buffer.submit({'firm': 'A', 'city': 'Boston'})
+    await buffer.flush()
+    assert writer.writes == []
+    assert buffer.pending == {'firm': 'A', 'city': 'Boston'}
+
+    # An edit made while the write was failing wins over the restored value
+    buffer.submit({'firm': 'B'})
+    await asyncio.sleep(0.05)
+    assert writer.writes == [{'firm': 'B', 'city': 'Boston'}]
+    assert buffer.settled
+
+
+async def test_fields_dropped_after_retries():
+    writer = FlakyWriter(failures=10)
+    buffer = WriteBehindBuffer(writer, delay=0.001, max_delay=1, retries=2)
+    buffer.submit({'firm': 'A'})
+    await asyncio.sleep(0.1)
+    assert writer.failures == 7
+    assert buffer.pending == {}
+    assert not buffer.settled